@@ -1,14 +1,22 @@
 import asyncio
-import threading
-import os
 import logging
-from multiprocessing import Queue
+
+from hypercorn.asyncio import serve
+from hypercorn.config import Config as HypercornConfig
+
+try:
+    import uvloop
+except ImportError:
+    # uvloop does not support Windows; fall back to the default event loop there
+    uvloop = None
 
 from modules.tm_manager.api_client import VexTmApiClient
 from modules.tm_manager.connector import VexTmConnector
 from modules.tm_manager.schedule_fetcher import ScheduleFetcher
 from modules.event_processor import EventProcessor
 from modules.match_scheduler import MatchScheduler
+from modules.event_queue import EVENT_QUEUE_MAXSIZE
+from models.config import load_vex_tm_creds
 from server import app, set_event_queue
 
 # Configure logging
@@ -22,10 +30,14 @@ logging.getLogger("server").setLevel(logging.INFO)
 # Enable debug logging specifically for the zeros controller
 logging.getLogger("modules.vfx.zeros.controller").setLevel(logging.DEBUG)
 
-def run_flask(host, port):
-    """Function to run Flask app in a separate thread."""
-    logger.info(f"Starting Flask server on {host}:{port}")
-    app.run(host=host, port=port, debug=False)
+async def run_web_server(host, port):
+    """Serve the Quart app with hypercorn on the running event loop."""
+    config = HypercornConfig()
+    config.bind = [f"{host}:{port}"]
+    logger.info(f"Starting web server on {host}:{port}")
+    # Never trigger a hypercorn-initiated shutdown; the TaskGroup owns the lifecycle
+    # and KeyboardInterrupt keeps its default behaviour.
+    await serve(app, config, shutdown_trigger=asyncio.Event().wait)
 
 async def main():
     """
@@ -33,9 +45,16 @@ async def main():
     """
     logger.info("Initializing application...")
 
+    # Start tasks eagerly: each coroutine runs synchronously up to its first
+    # suspension instead of waiting an extra loop iteration to be scheduled.
+    # eager_task_factory is Python 3.12+; older interpreters keep the default.
+    if hasattr(asyncio, 'eager_task_factory'):
+        asyncio.get_running_loop().set_task_factory(asyncio.eager_task_factory)
+
     # A queue that can be shared between processes if we need to scale out.
-    # For now, it works fine with threads.
-    event_queue = asyncio.Queue()
+    # For now, it works fine with threads. It is bounded so that bursts of
+    # events cannot grow memory without limit.
+    event_queue = asyncio.Queue(maxsize=EVENT_QUEUE_MAXSIZE)
 
     # --- Load Configuration ---
     # The EventProcessor loads the full config, we'll use that as the source of truth
@@ -43,65 +62,51 @@ async def main():
     config = event_processor.config
 
     # Get VEX TM API credentials from the loaded config
-    vex_tm_api_config = config.vex_tm_api
-    client_id = vex_tm_api_config.get("client_id")
-    client_secret = vex_tm_api_config.get("client_secret")
-    api_key = vex_tm_api_config.get("api_key")
-    base_url = vex_tm_api_config.get("base_url", "http://localhost:8080")
-    field_set_id = int(vex_tm_api_config.get("field_set_id", os.environ.get("VEX_TM_FIELD_SET_ID", 1)))
-
-    if not all([client_id, client_secret, api_key]):
+    creds = load_vex_tm_creds(config)
+
+    if not creds.is_complete:
         logger.error("Missing required VEX TM API configuration in config.json. Please set client_id, client_secret, and api_key under the 'vex_tm_api' key.")
         return
 
-    # Share the queue with the Flask app for manual controls
-    set_event_queue(event_queue, asyncio.get_running_loop())
+    # Share the queue with the Quart app for manual controls
+    set_event_queue(event_queue)
 
     # --- Initialize Components ---
     # API Client
+    # Shared by every VEX TM API consumer so its connection pool is reused
     api_client = VexTmApiClient(
-        client_id=client_id,
-        client_secret=client_secret,
-        api_key=api_key,
-        base_url=base_url
+        client_id=creds.client_id,
+        client_secret=creds.client_secret,
+        api_key=creds.api_key,
+        base_url=creds.base_url
     )
 
     # Thread 5: Websocket Connector
     vex_tm_connector = VexTmConnector(
         event_queue=event_queue,
         api_client=api_client,
-        base_url=base_url,
-        field_set_id=field_set_id
+        base_url=creds.base_url,
+        field_set_id=creds.field_set_id
     )
 
     # Thread 3: Schedule Fetcher
     schedule_fetcher = ScheduleFetcher(api_client)
 
     # Thread 4: Match Scheduler
-    match_scheduler = MatchScheduler(event_queue)
-
-    # Thread 1: Flask Frontend
-    # The Flask app will run in its own thread so it doesn't block asyncio
-    flask_thread = threading.Thread(target=run_flask, args=('0.0.0.0', 5000), daemon=True)
+    match_scheduler = MatchScheduler(event_queue, field_registry=event_processor.field_states)
+    event_processor.field_state_listeners.append(match_scheduler.notify)
 
     # --- Start Services ---
     try:
         logger.info("Starting services...")
-        flask_thread.start()
-
-        # Create asyncio tasks for our async components
-        connector_task = asyncio.create_task(vex_tm_connector.connect())
-        processor_task = asyncio.create_task(event_processor.process_events())
-        fetcher_task = asyncio.create_task(schedule_fetcher.run())
-        scheduler_task = asyncio.create_task(match_scheduler.run())
-
-        # Run forever
-        await asyncio.gather(
-            connector_task, 
-            processor_task,
-            fetcher_task,
-            scheduler_task
-        )
+
+        # Run forever. The TaskGroup cancels the remaining services if one of them fails.
+        async with asyncio.TaskGroup() as tg:
+            tg.create_task(vex_tm_connector.connect())
+            tg.create_task(event_processor.process_events())
+            tg.create_task(schedule_fetcher.run())
+            tg.create_task(match_scheduler.run())
+            tg.create_task(run_web_server('0.0.0.0', 5000))
 
     except asyncio.CancelledError:
         logger.info("Main task cancelled.")
@@ -109,18 +114,14 @@ async def main():
         logger.error(f"An unexpected error occurred in main: {e}", exc_info=True)
     finally:
         logger.info("Shutting down services.")
-        if 'scheduler_task' in locals() and not scheduler_task.done():
-            scheduler_task.cancel()
-        if 'fetcher_task' in locals() and not fetcher_task.done():
-            fetcher_task.cancel()
-        if 'processor_task' in locals() and not processor_task.done():
-            processor_task.cancel()
-        if 'connector_task' in locals() and not connector_task.done():
-            connector_task.cancel()
-        # The Flask thread is a daemon, so it will exit when the main thread does.
+        event_processor.close()
+        await api_client.close()
 
 if __name__ == "__main__":
     try:
-        asyncio.run(main())
+        if uvloop is not None:
+            uvloop.run(main())
+        else:
+            asyncio.run(main())
     except KeyboardInterrupt:
         logger.info("Application terminated by user.")
\ No newline at end of file
@@ -1,30 +1,32 @@
 from dataclasses import dataclass, field
 from typing import Optional
 import uuid
-from datetime import datetime
-from .base import BaseModel
+from .base import BaseModel, now_iso
 import logging
 
 logger = logging.getLogger(__name__)
 
-@dataclass
+def _new_action_id():
+    return uuid.uuid4().hex
+
+@dataclass(slots=True, frozen=True)
 class Action(BaseModel):
     command: str
     metadata: Optional[dict] = None
     type: Optional[str] = None
     priority: int = 0
-    id: str = field(default_factory=lambda: str(uuid.uuid4()))
-    timestamp: str = field(default_factory=lambda: datetime.now().isoformat())
+    id: str = field(default_factory=_new_action_id)
+    timestamp: str = field(default_factory=now_iso)
 
-@dataclass
+@dataclass(slots=True, frozen=True)
 class AudioAction(Action):
     type: str = "audio"
 
-@dataclass
+@dataclass(slots=True, frozen=True)
 class VideoAction(Action):
     type: str = "video"
 
-@dataclass
+@dataclass(slots=True, frozen=True)
 class LightingAction(Action):
     preset_id: Optional[str] = None
     release_id: Optional[str] = None
@@ -36,89 +38,217 @@ class LightingAction(Action):
     type: str = "lighting"
 
 import fnmatch
+import functools
+import os
+from collections import Counter, OrderedDict
+import re
 
 # ... existing code ...
 
+@functools.lru_cache(maxsize=256)
+def _compile_glob(pat):
+    """Translate a match_name glob to a compiled regex once and reuse it."""
+    return re.compile(fnmatch.translate(os.path.normcase(pat)))
+
+def _filter_key(item):
+    """Hashable identity of a payload_filter (key, value) pair, for selectivity counting."""
+    key, value = item
+    try:
+        hash(value)
+    except TypeError:
+        value = repr(value)
+    return key, value
+
+def _prepare_actions(actions):
+    """Pre-digest action dicts into (priority, type, action) entries; untyped actions can never be dispatched."""
+    return tuple((action.get("priority", 0), action["type"], action) for action in actions if action.get("type"))
+
+@dataclass(slots=True)
+class _CompiledGroup:
+    """An action group from actions.json with its filters pre-digested for dispatch."""
+    pattern: str
+    match_re: Optional[re.Pattern]  # None when the pattern is "*"
+    has_payload_filter: bool
+    payload_items: tuple
+    fields_all: tuple  # (priority, type, action_dict) entries
+    fields_by_id: dict
+
+    @classmethod
+    def from_group(cls, group, filter_counts=None):
+        pattern = group.get("match_name", "*")
+        payload_filter = group.get("payload_filter")
+        fields = group.get("fields", {})
+        payload_items = tuple(payload_filter.items()) if payload_filter else ()
+        if filter_counts and len(payload_items) > 1:
+            # Check the rarest (most selective) conditions first so mismatches bail out early
+            payload_items = tuple(sorted(payload_items, key=lambda kv: filter_counts.get(_filter_key(kv), 0)))
+        return cls(
+            pattern=pattern,
+            match_re=None if pattern == "*" else _compile_glob(pattern),
+            has_payload_filter=bool(payload_filter),
+            payload_items=payload_items,
+            fields_all=_prepare_actions(fields.get("all", [])),
+            fields_by_id={k: _prepare_actions(v) for k, v in fields.items() if k != "all"},
+        )
+
 class ActionMapping(BaseModel):
+    # Bound on memoized get_actions results per mapping
+    CACHE_MAXSIZE = 2048
+
     def __init__(self, on_event=None, on_state_change=None):
         self.on_event = on_event or {}
         self.on_state_change = on_state_change or {}
+        filter_counts = Counter(
+            _filter_key(item)
+            for category in (self.on_event, self.on_state_change)
+            for action_groups in category.values() if isinstance(action_groups, list)
+            for group in action_groups
+            for item in (group.get("payload_filter") or {}).items()
+        )
+        self._compiled = {
+            "on_event": self._compile_category(self.on_event, filter_counts),
+            "on_state_change": self._compile_category(self.on_state_change, filter_counts),
+        }
+        # Payload keys any group of a (category, key) filters on; only these can change the result
+        self._filter_keys = {
+            category: {
+                key: tuple(sorted({k for group in groups for k, _ in group.payload_items}))
+                for key, groups in compiled.items()
+            }
+            for category, compiled in self._compiled.items()
+        }
+        # category -> key -> field key (None for fields no group names) -> ((group, actions), ...)
+        self._index = {
+            category: {key: self._index_groups(groups) for key, groups in compiled.items()}
+            for category, compiled in self._compiled.items()
+        }
+        self._cache = OrderedDict()
+
+    @staticmethod
+    def _index_groups(groups):
+        """
+        Specializes a key's groups per field: each entry pairs a group with the actions it
+        contributes for that field ("all" plus the field's own), and groups that contribute
+        nothing for a field are left out so their filters are never evaluated.
+        """
+        def entries(field_key):
+            out = []
+            for group in groups:
+                actions = group.fields_all + group.fields_by_id.get(field_key, ()) if field_key else group.fields_all
+                if actions:
+                    out.append((group, actions))
+            return tuple(out)
+
+        index = {field_key: entries(field_key) for field_key in {k for group in groups for k in group.fields_by_id}}
+        index[None] = entries(None)
+        return index
+
+    @staticmethod
+    def _compile_category(category, filter_counts):
+        compiled = {}
+        for key, action_groups in category.items():
+            if not isinstance(action_groups, list):
+                compiled[key] = []
+                continue
+            compiled[key] = [_CompiledGroup.from_group(group, filter_counts) for group in action_groups]
+        return compiled
+
+    def to_dict(self):
+        return {"on_event": self.on_event, "on_state_change": self.on_state_change}
+
+    def cache_clear(self):
+        self._cache.clear()
 
     def get_actions(self, category, key, field_id=None, match_name=None, event_payload=None):
         """
-        Retrieves actions for a given category (e.g., 'on_event'), key (e.g., 'matchStarted'),
-        and optional field_id, match_name, and event_payload.
+        Retrieves actions for a given category name ('on_event' or 'on_state_change'),
+        key (e.g., 'matchStarted'), and optional field_id, match_name, and event_payload.
         
         It aggregates actions based on match name patterns, payload filters, and field IDs,
-        then filters for the highest priority action per type.
+        then filters for the highest priority action per type. Results (including empty
+        ones) are memoized on the inputs that can affect them.
         """
-        logger.debug(f"Getting actions for category='{key}', field_id='{field_id}', match_name='{match_name}', payload='{event_payload}'")
-        all_actions = []
+        filter_keys = self._filter_keys[category].get(key, ())
+        # Groups with a payload_filter skip events without a payload, so keep that distinct
+        projected = tuple(event_payload.get(k) for k in filter_keys) if event_payload else None
+        cache_key = (category, key, str(field_id) if field_id else None, match_name, projected)
+        try:
+            cached = self._cache.get(cache_key)
+        except TypeError:
+            # Unhashable payload values; compute without caching
+            return self._collect_actions(category, key, field_id, match_name, event_payload)
+
+        if cached is None:
+            cached = tuple(self._collect_actions(category, key, field_id, match_name, event_payload))
+            self._cache[cache_key] = cached
+            if len(self._cache) > self.CACHE_MAXSIZE:
+                self._cache.popitem(last=False)
+        else:
+            self._cache.move_to_end(cache_key)
+        return list(cached)
+
+    def _collect_actions(self, category, key, field_id, match_name, event_payload):
+        # Checked once so the per-group debug lines cost nothing when DEBUG is off
+        debug = logger.isEnabledFor(logging.DEBUG)
+        if debug:
+            logger.debug("Getting actions for category=%r, field_id=%r, match_name=%r, payload=%r", key, field_id, match_name, event_payload)
+        # type -> (highest priority seen, actions at that priority)
+        best = {}
         
-        action_groups = category.get(key, [])
-        logger.debug(f"Found action groups: {action_groups}")
+        field_key = str(field_id) if field_id else None
+        by_field = self._index[category].get(key)
+        candidates = by_field.get(field_key, by_field[None]) if by_field else ()
+        if debug:
+            logger.debug("Found %d candidate action groups", len(candidates))
 
-        if not isinstance(action_groups, list):
-            return []
+        normalized_match_name = os.path.normcase(match_name) if match_name is not None else None
 
-        for group in action_groups:
-            group_match_name = group.get("match_name", "*")
-            
+        for group, actions in candidates:
             # 1. Check payload filter
-            payload_filter = group.get("payload_filter")
-            if payload_filter:
+            if group.has_payload_filter:
                 if not event_payload:
-                    logger.debug("Group has payload_filter but event has no payload. Skipping.")
+                    if debug:
+                        logger.debug("Group has payload_filter but event has no payload. Skipping.")
                     continue
                 
-                payload_match = all(event_payload.get(k) == v for k, v in payload_filter.items())
+                payload_match = True
+                for k, v in group.payload_items:
+                    if event_payload.get(k) != v:
+                        payload_match = False
+                        break
                 
                 if not payload_match:
-                    logger.debug(f"Payload filter mismatch. Event: {event_payload}, Filter: {payload_filter}. Skipping.")
+                    if debug:
+                        logger.debug("Payload filter mismatch. Event: %r, Filter: %r. Skipping.", event_payload, dict(group.payload_items))
                     continue
-                logger.debug("Payload filter matched.")
+                if debug:
+                    logger.debug("Payload filter matched.")
 
             # 2. Check match name pattern
             # If match_name is None (e.g. for non-match events), it should only match '*'
-            if match_name is None:
-                if group_match_name != "*":
-                    logger.debug(f"No match_name in event, but group requires '{group_match_name}'. Skipping.")
+            if group.match_re is not None:
+                if match_name is None:
+                    if debug:
+                        logger.debug("No match_name in event, but group requires %r. Skipping.", group.pattern)
+                    continue
+                if group.match_re.match(normalized_match_name) is None:
+                    if debug:
+                        logger.debug("Match name %r does not match pattern %r. Skipping.", match_name, group.pattern)
                     continue
-            elif not fnmatch.fnmatch(match_name, group_match_name):
-                logger.debug(f"Match name '{match_name}' does not match pattern '{group_match_name}'. Skipping.")
-                continue
-            
-            logger.debug(f"Match! Name:'{match_name}' vs Pattern:'{group_match_name}'.")
-            
-            # 3. Collect actions if filters passed
-            fields = group.get("fields", {})
-            potential_actions = fields.get("all", []) + (fields.get(str(field_id), []) if field_id else [])
             
-            for action_data in potential_actions:
-                action_data_copy = action_data.copy()
-                action_data_copy['priority'] = action_data.get('priority', 0)
-                all_actions.append(action_data_copy)
-        
-        # Prioritize and filter actions
-        actions_by_type = {}
-        for action in all_actions:
-            action_type = action.get("type")
-            if not action_type:
-                continue
-            if action_type not in actions_by_type:
-                actions_by_type[action_type] = []
-            actions_by_type[action_type].append(action)
-
-        final_actions = []
-        for action_type, typed_actions in actions_by_type.items():
-            if not typed_actions:
-                continue
+            if debug:
+                logger.debug("Match! Name:%r vs Pattern:%r.", match_name, group.pattern)
             
-            max_priority = max(a.get('priority', 0) for a in typed_actions)
+            # 3. Collect actions if filters passed, keeping only the highest priority actions per type
+            for priority, action_type, action in actions:
+                current = best.get(action_type)
+                if current is None or priority > current[0]:
+                    best[action_type] = (priority, [action])
+                elif priority == current[0]:
+                    current[1].append(action)
 
-            for action in typed_actions:
-                if action.get('priority', 0) == max_priority:
-                    final_actions.append(action)
+        final_actions = [action for _, winners in best.values() for action in winners]
 
-        logger.debug(f"Returning {len(final_actions)} prioritized actions: {final_actions}")
+        if debug:
+            logger.debug("Returning %d prioritized actions: %r", len(final_actions), final_actions)
         return final_actions
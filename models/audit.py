@@ -1,10 +1,11 @@
-from .base import BaseModel
-from datetime import datetime
+from .base import BaseModel, now_iso
 
 class AuditEntry(BaseModel):
+    __slots__ = ('event_id', 'timestamp', 'status', 'action_id', 'outcome')
+
     def __init__(self, event_id, timestamp=None, status=None, action_id=None, outcome=None):
         self.event_id = event_id
-        self.timestamp = timestamp or datetime.utcnow().isoformat()
+        self.timestamp = timestamp or now_iso()
         self.status = status # e.g., "received", "processed", "failed"
         self.action_id = action_id
         self.outcome = outcome # e.g., "success", "failure"
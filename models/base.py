@@ -1,17 +1,67 @@
-import json
-from datetime import datetime
+import functools
+import time
+import orjson
+
+
+# (epoch second, formatted "YYYY-MM-DDTHH:MM:SS") for the last timestamp handed out
+_iso_second = (None, '')
+
+
+def now_iso():
+    """
+    Current UTC time as a naive ISO-8601 string (same shape as datetime.utcnow().isoformat()).
+
+    Only the sub-second part is formatted per call; the date/time prefix is reused for
+    every timestamp minted within the same second.
+    """
+    global _iso_second
+    sec, us = divmod(time.time_ns() // 1000, 1_000_000)
+    cached_sec, prefix = _iso_second
+    if sec != cached_sec:
+        prefix = time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime(sec))
+        _iso_second = (sec, prefix)
+    return f"{prefix}.{us:06d}"
+
+
+@functools.lru_cache(maxsize=None)
+def _slot_names(cls):
+    """Collect the slot attributes declared across a class hierarchy, base first."""
+    names = []
+    for klass in reversed(cls.__mro__):
+        slots = klass.__dict__.get('__slots__', ())
+        if isinstance(slots, str):
+            slots = (slots,)
+        for name in slots:
+            if name not in ('__dict__', '__weakref__') and name not in names:
+                names.append(name)
+    return tuple(names)
+
+
+def _default(o):
+    if isinstance(o, BaseModel):
+        return o.to_dict()
+    return o.__dict__
+
 
 class BaseModel:
+    __slots__ = ()
+
     def to_json(self):
-        return json.dumps(self, default=lambda o: o.__dict__, sort_keys=True, indent=4)
+        return self.to_json_bytes().decode()
+
+    def to_json_bytes(self):
+        """UTF-8 encoded JSON, for writing straight to binary files."""
+        return orjson.dumps(self, default=_default, option=orjson.OPT_SORT_KEYS | orjson.OPT_INDENT_2)
 
     @classmethod
     def from_json(cls, json_str):
-        data = json.loads(json_str)
+        data = orjson.loads(json_str)
         return cls(**data)
 
     def to_dict(self):
-        return self.__dict__
+        if hasattr(self, '__dict__'):
+            return self.__dict__
+        return {name: getattr(self, name) for name in _slot_names(type(self))}
 
     @classmethod
     def from_dict(cls, data):
@@ -1,7 +1,19 @@
+import functools
+import os
+from dataclasses import dataclass
+from typing import Optional
+
 from .base import BaseModel
 
 class Config(BaseModel):
-    def __init__(self, device_ips=None, field_to_camera=None, spotify_device_id=None, websocket_endpoints=None, schedule_lead_matches=5, match_queue_pause=None, paused=None, rooms=None, ntfy_error_endpoint=None, ntfy_user=None, ntfy_pass=None, vex_tm_api=None):
+    __slots__ = (
+        'device_ips', 'field_to_camera', 'spotify_device_id', 'websocket_endpoints',
+        'schedule_lead_matches', 'match_queue_pause', 'paused', 'rooms',
+        'ntfy_error_endpoint', 'ntfy_user', 'ntfy_pass', 'vex_tm_api',
+        'password_hash_method',
+    )
+
+    def __init__(self, device_ips=None, field_to_camera=None, spotify_device_id=None, websocket_endpoints=None, schedule_lead_matches=5, match_queue_pause=None, paused=None, rooms=None, ntfy_error_endpoint=None, ntfy_user=None, ntfy_pass=None, vex_tm_api=None, password_hash_method=None):
         self.device_ips = device_ips or {}
         self.field_to_camera = field_to_camera or {}
         self.spotify_device_id = spotify_device_id
@@ -14,3 +26,30 @@ class Config(BaseModel):
         self.ntfy_user = ntfy_user
         self.ntfy_pass = ntfy_pass
         self.vex_tm_api = vex_tm_api or {}
+        # Werkzeug hash method for new passwords, e.g. 'scrypt:16384:8:1'; None uses the default
+        self.password_hash_method = password_hash_method
+
+@dataclass(frozen=True, slots=True)
+class VexTmApiCreds:
+    """Immutable snapshot of the `vex_tm_api` section of config.json."""
+    client_id: Optional[str]
+    client_secret: Optional[str]
+    api_key: Optional[str]
+    base_url: str
+    field_set_id: int
+
+    @property
+    def is_complete(self):
+        return all([self.client_id, self.client_secret, self.api_key])
+
+@functools.lru_cache(maxsize=1)
+def load_vex_tm_creds(config):
+    """Reads the VEX TM API credentials out of a Config once per Config instance."""
+    vex_tm_api_config = config.vex_tm_api
+    return VexTmApiCreds(
+        client_id=vex_tm_api_config.get("client_id"),
+        client_secret=vex_tm_api_config.get("client_secret"),
+        api_key=vex_tm_api_config.get("api_key"),
+        base_url=vex_tm_api_config.get("base_url", "http://localhost:8080"),
+        field_set_id=int(vex_tm_api_config.get("field_set_id", os.environ.get("VEX_TM_FIELD_SET_ID", 1))),
+    )
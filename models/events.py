@@ -1,11 +1,12 @@
-from .base import BaseModel
+from .base import BaseModel, now_iso
 import uuid
-from datetime import datetime
 
 class Event(BaseModel):
+    __slots__ = ('id', 'type', 'timestamp', 'field', 'payload')
+
     def __init__(self, type, timestamp=None, field=None, payload=None, id=None):
         self.id = id or str(uuid.uuid4())
         self.type = type
-        self.timestamp = timestamp or datetime.utcnow().isoformat()
+        self.timestamp = timestamp or now_iso()
         self.field = field
         self.payload = payload or {}
@@ -1,7 +1,17 @@
-from .base import BaseModel
-from datetime import datetime
+import functools
+from .base import BaseModel, now_iso
+
+
+@functools.lru_cache(maxsize=1024)
+def _match_name_from_id(round_val, match_num):
+    """Derive a match name like "Q21" from a legacy match_id's round and match number."""
+    round_prefix = round_val[0].upper() if round_val else "M"
+    return f"{round_prefix}{match_num}"
+
 
 class FieldState(BaseModel):
+    __slots__ = ('field_id', 'state', 'match_name', 'match_id', 'last_updated')
+
     def __init__(self, field_id, state, match_name=None, match_id=None, last_updated=None):
         self.field_id = field_id
         self.state = state  # e.g., "queued", "countdown", "active", "finish", "standby"
@@ -10,13 +20,14 @@ class FieldState(BaseModel):
         if match_id and not match_name:
             if isinstance(match_id, dict):
                 # Assuming match_id is an object like {"round": "QUAL", "match": 21}
-                round_val = match_id.get("round")
-                round_prefix = round_val[0].upper() if round_val else "M"
-                self.match_name = f"{round_prefix}{match_id.get('match', '')}"
+                self.match_name = _match_name_from_id(match_id.get("round"), match_id.get('match', ''))
             else:
                 # Fallback for older string format
                 self.match_name = str(match_id)
         else:
             self.match_name = match_name
+
+        # The assigned match tuple (division, round, match, ...) when known
+        self.match_id = match_id if isinstance(match_id, dict) else None
             
-        self.last_updated = last_updated or datetime.utcnow().isoformat()
\ No newline at end of file
+        self.last_updated = last_updated or now_iso()
\ No newline at end of file
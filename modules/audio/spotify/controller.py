@@ -1,3 +1,4 @@
+import asyncio
 import spotipy
 from spotipy.oauth2 import SpotifyOAuth
 import os
@@ -8,14 +9,19 @@ import time
 
 logger = logging.getLogger(__name__)
 
+# Last run of digits in a match name, e.g. "Q21" -> 21, "SF1-2" -> 2
+_MATCH_NUM_RE = re.compile(r'(\d+)\D*$')
+
+# Retry policy for rate-limited / unavailable responses from the Spotify API
+_MAX_ATTEMPTS = 3
+_BACKOFF_BASE_S = 0.25
+
 def _extract_match_number(match_name):
     if not match_name:
         return None
     
-    numbers = re.findall(r'\d+', match_name)
-    if numbers:
-        return int(numbers[-1])
-    return None
+    m = _MATCH_NUM_RE.search(match_name)
+    return int(m.group(1)) if m else None
 
 class SpotifyController:
     def __init__(self, client_id, client_secret, redirect_uri, device_name=None):
@@ -31,7 +37,7 @@ class SpotifyController:
             ))
             self._set_device_id()
         except Exception as e:
-            logger.error(f"Failed to initialize Spotify client: {e}")
+            logger.error("Failed to initialize Spotify client: %s", e)
             self.sp = None
 
     def _set_device_id(self):
@@ -44,20 +50,20 @@ class SpotifyController:
                     for device in devices['devices']:
                         if device['name'].lower() == self.device_name.lower():
                             self.device_id = device['id']
-                            logger.info(f"Found Spotify device '{self.device_name}' with ID: {self.device_id}")
+                            logger.info("Found Spotify device '%s' with ID: %s", self.device_name, self.device_id)
                             break
                     if not self.device_id:
-                        logger.warning(f"Could not find a device named '{self.device_name}'. Using the first available device.")
+                        logger.warning("Could not find a device named '%s'. Using the first available device.", self.device_name)
                         self.device_id = devices['devices'][0]['id']
                 else:
                     self.device_id = devices['devices'][0]['id']
-                    logger.info(f"No device name specified. Using first available device: {devices['devices'][0]['name']}")
+                    logger.info("No device name specified. Using first available device: %s", devices['devices'][0]['name'])
             else:
                 logger.warning("No active Spotify devices found.")
         except Exception as e:
-            logger.error(f"Error getting Spotify devices: {e}")
+            logger.error("Error getting Spotify devices: %s", e)
 
-    def execute_action(self, action):
+    async def execute_action(self, action):
         if not self.sp or not self.device_id:
             logger.error("Spotify client not initialized or no device selected. Cannot execute action.")
             return
@@ -65,85 +71,156 @@ class SpotifyController:
         command = action.command
         metadata = action.metadata or {}
         
-        logger.info(f"Executing Spotify action: {command} with metadata: {metadata}")
+        logger.info("Executing Spotify action: %s with metadata: %s", command, metadata)
 
-        for attempt in range(2): # Try once, then retry once
+        for attempt in range(_MAX_ATTEMPTS):
             try:
-                if command == "play":
-                    self.sp.start_playback(device_id=self.device_id, context_uri=metadata.get("context_uri"))
-                elif command == "play_playlist_track":
-                    playlist_uri = metadata.get("playlist_uri")
-                    track_number = metadata.get("track_number") # 1-based index
-                    
-                    if not playlist_uri:
-                        logger.error("play_playlist_track command requires 'playlist_uri' in metadata.")
-                        return
-
-                    if track_number is not None:
-                        logger.info(f"Playing track {track_number} from playlist {playlist_uri}")
-                        # Spotify API is 0-indexed for tracks
-                        self.sp.start_playback(device_id=self.device_id, context_uri=playlist_uri, offset={"position": track_number - 1})
-                    else:
-                        logger.info(f"No track number provided. Playing a random track from playlist {playlist_uri}")
-                        try:
-                            # Get the total number of tracks in the playlist
-                            playlist_items = self.sp.playlist_items(playlist_uri, fields='total')
-                            if not playlist_items:
-                                logger.warning(f"Could not retrieve items for playlist {playlist_uri}.")
-                                return
-
-                            total_tracks = playlist_items.get('total', 0)
-                            
-                            if total_tracks > 0:
-                                # Pick a random track
-                                random_track_index = random.randint(0, total_tracks - 1)
-                                logger.info(f"Selected random track number {random_track_index + 1} out of {total_tracks}")
-                                self.sp.start_playback(device_id=self.device_id, context_uri=playlist_uri, offset={"position": random_track_index})
-                            else:
-                                logger.warning(f"Playlist {playlist_uri} is empty. Cannot play a random track.")
-                        except spotipy.exceptions.SpotifyException as e:
-                            logger.error(f"Could not fetch playlist details to play random track: {e}")
-
-                elif command == "play_track":
-                    track_uri = metadata.get("track_uri")
-                    start_time_s = metadata.get("start_time_s", 0)
-
-                    if not track_uri:
-                        logger.error("play_track command requires 'track_uri' in metadata.")
-                        return
-                    
-                    # Ensure track_uri is in the correct format
-                    if not track_uri.startswith("spotify:track:"):
-                        track_uri = f"spotify:track:{track_uri}"
-
-                    start_time_ms = int(start_time_s) * 1000
-                    
-                    logger.info(f"Playing track {track_uri} starting at {start_time_s}s ({start_time_ms}ms)")
-                    self.sp.start_playback(device_id=self.device_id, uris=[track_uri], position_ms=start_time_ms)
-
-                elif command == "pause":
-                    self.sp.pause_playback(device_id=self.device_id)
-                elif command == "next":
-                    self.sp.next_track(device_id=self.device_id)
-                elif command == "previous":
-                    self.sp.previous_track(device_id=self.device_id)
-                elif command == "set_volume":
-                    volume = metadata.get("volume", 50)
-                    self.sp.volume(volume_percent=volume, device_id=self.device_id)
-                else:
-                    logger.warning(f"Unknown Spotify command: {command}")
-                
+                # The SDK is blocking; keep its HTTP calls off the event loop
+                await asyncio.to_thread(self._run_command, command, metadata)
                 break # If successful, exit the loop
             except spotipy.exceptions.SpotifyException as e:
-                logger.error(f"Spotify API error on attempt {attempt + 1}: {e}")
-                if attempt == 1: # Last attempt failed
+                logger.error("Spotify API error on attempt %s: %s", attempt + 1, e)
+                if attempt == _MAX_ATTEMPTS - 1: # Last attempt failed
                     logger.error("Spotify command failed after multiple retries.")
                 else:
-                    time.sleep(1) # Wait 1 second before retrying
+                    await asyncio.sleep(self._retry_delay(e, attempt))
             except Exception as e:
-                logger.error(f"An unexpected error occurred during Spotify action execution: {e}")
+                logger.error("An unexpected error occurred during Spotify action execution: %s", e)
                 break # Don't retry on unexpected errors
 
+    @staticmethod
+    def _retry_delay(error, attempt):
+        """Honour Retry-After on 429/503 responses, otherwise back off exponentially with jitter."""
+        headers = getattr(error, 'headers', None) or {}
+        retry_after = headers.get('Retry-After')
+        if retry_after:
+            try:
+                return float(retry_after)
+            except ValueError:
+                pass
+        return 2 ** attempt * _BACKOFF_BASE_S + random.random() * 0.1
+
+    def _run_command(self, command, metadata):
+        if command == "play":
+            self.sp.start_playback(device_id=self.device_id, context_uri=metadata.get("context_uri"))
+        elif command == "play_playlist_track":
+            playlist_uri = metadata.get("playlist_uri")
+            track_number = metadata.get("track_number") # 1-based index
+            
+            if not playlist_uri:
+                logger.error("play_playlist_track command requires 'playlist_uri' in metadata.")
+                return
+
+            if track_number is not None:
+                logger.info("Playing track %s from playlist %s", track_number, playlist_uri)
+                # Spotify API is 0-indexed for tracks
+                self.sp.start_playback(device_id=self.device_id, context_uri=playlist_uri, offset={"position": track_number - 1})
+            else:
+                logger.info("No track number provided. Playing a random track from playlist %s", playlist_uri)
+                try:
+                    # Get the total number of tracks in the playlist
+                    playlist_items = self.sp.playlist_items(playlist_uri, fields='total')
+                    if not playlist_items:
+                        logger.warning("Could not retrieve items for playlist %s.", playlist_uri)
+                        return
+
+                    total_tracks = playlist_items.get('total', 0)
+                    
+                    if total_tracks > 0:
+                        # Pick a random track
+                        random_track_index = random.randint(0, total_tracks - 1)
+                        logger.info("Selected random track number %s out of %s", random_track_index + 1, total_tracks)
+                        self.sp.start_playback(device_id=self.device_id, context_uri=playlist_uri, offset={"position": random_track_index})
+                    else:
+                        logger.warning("Playlist %s is empty. Cannot play a random track.", playlist_uri)
+                except spotipy.exceptions.SpotifyException as e:
+                    logger.error("Could not fetch playlist details to play random track: %s", e)
+
+        elif command == "play_track":
+            track_uri = metadata.get("track_uri")
+            start_time_s = metadata.get("start_time_s", 0)
+
+            if not track_uri:
+                logger.error("play_track command requires 'track_uri' in metadata.")
+                return
+            
+            # Ensure track_uri is in the correct format
+            if not track_uri.startswith("spotify:track:"):
+                track_uri = f"spotify:track:{track_uri}"
+
+            start_time_ms = int(start_time_s) * 1000
+            
+            logger.info("Playing track %s starting at %ss (%sms)", track_uri, start_time_s, start_time_ms)
+            self.sp.start_playback(device_id=self.device_id, uris=[track_uri], position_ms=start_time_ms)
+
+        elif command == "pause":
+            self.sp.pause_playback(device_id=self.device_id)
+        elif command == "next":
+            self.sp.next_track(device_id=self.device_id)
+        elif command == "previous":
+            self.sp.previous_track(device_id=self.device_id)
+        elif command == "set_volume":
+            volume = metadata.get("volume", 50)
+            self.sp.volume(volume_percent=volume, device_id=self.device_id)
+        else:
+            logger.warning("Unknown Spotify command: %s", command)
+
+# Commands that set the playback state outright; within a batch only the last one matters
+_PLAYBACK_STATE_COMMANDS = frozenset({"play", "play_playlist_track", "play_track", "pause"})
+
+class SpotifyActionBatcher:
+    """
+    Buffers Spotify actions for a short window and executes them off the event loop.
+
+    Actions that arrive together (e.g. a match starting on several fields at once) are
+    coalesced: only the last playback-state command and the last set_volume in a window
+    are sent, since each one overrides the previous. Other commands are sent in order.
+    """
+    def __init__(self, controller, window_s=0.02):
+        self.controller = controller
+        self.window_s = window_s
+        self._queue = asyncio.Queue()
+        self._task = None
+
+    def submit(self, action):
+        self._queue.put_nowait(action)
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    async def _run(self):
+        while True:
+            batch = [await self._queue.get()]
+            await asyncio.sleep(self.window_s)
+            while not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+
+            actions = self._coalesce(batch)
+            if len(actions) < len(batch):
+                logger.info("Coalesced %s Spotify actions into %s", len(batch), len(actions))
+            for action in actions:
+                try:
+                    await self.controller.execute_action(action)
+                except Exception as e:
+                    logger.error("Error executing batched Spotify action: %s", e)
+
+    @staticmethod
+    def _coalesce(batch):
+        last_state = last_volume = None
+        for i, action in enumerate(batch):
+            if action.command in _PLAYBACK_STATE_COMMANDS:
+                last_state = i
+            elif action.command == "set_volume":
+                last_volume = i
+
+        kept = []
+        for i, action in enumerate(batch):
+            if action.command in _PLAYBACK_STATE_COMMANDS and i != last_state:
+                continue
+            if action.command == "set_volume" and i != last_volume:
+                continue
+            kept.append(action)
+        return kept
+
 if __name__ == '__main__':
     # Example usage for testing
     # You need to set these environment variables
@@ -167,10 +244,9 @@ if __name__ == '__main__':
             playlist_uri = "spotify:playlist:37i9dQZF1DXcBWIGoYBM5M" # Example: Today's Top Hits
             
             play_action = AudioAction(command="play", metadata={"context_uri": playlist_uri})
-            spotify_controller.execute_action(play_action)
+            asyncio.run(spotify_controller.execute_action(play_action))
             
-            import time
             time.sleep(5)
             
             pause_action = AudioAction(command="pause")
-            spotify_controller.execute_action(pause_action)
+            asyncio.run(spotify_controller.execute_action(pause_action))
@@ -1,5 +1,7 @@
 import asyncio
+import functools
 import json
+import orjson
 import os
 import logging
 import tempfile
@@ -9,17 +11,44 @@ from models.events import Event
 from models.fields import FieldState
 from models.actions import ActionMapping, AudioAction, VideoAction, LightingAction
 from models.config import Config
-from models.audit import AuditEntry
+from modules.event_queue import EVENT_QUEUE_MAXSIZE, drain
+from modules.popup_store import get_popup_store
 
 # Import controllers
-from modules.audio.spotify.controller import SpotifyController, _extract_match_number
+from modules.audio.spotify.controller import SpotifyController, SpotifyActionBatcher, _extract_match_number
 from modules.video.atem.controller import AtemController
-from modules.vfx.zeros.controller import ZerOSController
+from modules.vfx.zeros.controller import ZerOSController, ZerOSActionBatcher
 
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
+# Events for one field always go to the same worker, so they stay in order while
+# different fields are processed concurrently
+EVENT_WORKERS = 4
+
+# Match-name prefixes for TM rounds; other rounds fall back to their first letter
+_ROUND_PREFIXES = {
+    "QUAL": "Q",
+    "TOP_N": "F",
+}
+
+@functools.lru_cache(maxsize=1024)
+def _match_name_for(round_val, match_num):
+    round_prefix = None
+    if isinstance(round_val, str):
+        round_prefix = _ROUND_PREFIXES.get(round_val.upper())
+
+    if round_prefix is None:
+        logger.warning(f"Could not find a prefix for round '{round_val}'.")
+        # Fallback to first letter if it's a string
+        if isinstance(round_val, str) and len(round_val) > 0:
+            round_prefix = round_val[0].upper()
+        else:
+            return None # Cannot determine prefix
+
+    return f"{round_prefix}{match_num}"
+
 class EventProcessor:
     def __init__(self, event_queue, storage_path='storage'):
         self.event_queue = event_queue
@@ -29,20 +58,53 @@ class EventProcessor:
         self.config_file = os.path.join(self.storage_path, 'config.json')
         self.scheduled_matches_file = os.path.join(self.storage_path, 'scheduled_matches.json')
         self.popups_file = os.path.join(self.storage_path, 'popups.json')
+        self.popup_store = get_popup_store(self.popups_file)
         self.audit_log_file = os.path.join(self.storage_path, 'events.log')
+        # Append handle for the audit log, opened on first write and kept open across events
+        self._audit_log = None
+        # Audit entries wait here for the background flusher, which writes them in batches
+        self._audit_queue = asyncio.Queue(maxsize=EVENT_QUEUE_MAXSIZE)
+        self._audit_flusher = None
+        # (st_mtime_ns, st_size) of config/actions files as of their last load
+        self._source_stats = {}
         
         self.config = self._load_config()
         self.action_mappings = self._load_action_mappings()
         
         self._file_locks = {}
         os.makedirs(self.fields_dir, exist_ok=True)
+        # In-memory field states, kept current by _update_field_state; the field files
+        # are only the durable copy. Shared with the MatchScheduler.
+        self.field_states = self._load_field_states()
+        # Callables invoked after a field state change is committed (e.g. MatchScheduler.notify)
+        self.field_state_listeners = []
 
         # Initialize controllers
         self.spotify_controller = self._init_spotify_controller()
+        self.spotify_batcher = SpotifyActionBatcher(self.spotify_controller) if self.spotify_controller else None
         self.atem_controller = self._init_atem_controller()
         self.zeros_controller = self._init_zeros_controller()
+        self.zeros_batcher = ZerOSActionBatcher(self.zeros_controller) if self.zeros_controller else None
+
+    @staticmethod
+    def _stat_key(file_path):
+        try:
+            st = os.stat(file_path)
+        except FileNotFoundError:
+            return None
+        return st.st_mtime_ns, st.st_size
+
+    def _reload_if_changed(self):
+        """Re-read config.json and actions.json if they changed on disk since they were loaded."""
+        if self._stat_key(self.config_file) != self._source_stats.get(self.config_file):
+            logger.info(f"{self.config_file} changed on disk, reloading config.")
+            self.config = self._load_config()
+        if self._stat_key(self.actions_file) != self._source_stats.get(self.actions_file):
+            logger.info(f"{self.actions_file} changed on disk, reloading action mappings.")
+            self.action_mappings = self._load_action_mappings()
 
     def _load_config(self):
+        self._source_stats[self.config_file] = self._stat_key(self.config_file)
         try:
             with open(self.config_file, 'r') as f:
                 return Config.from_json(f.read())
@@ -94,9 +156,10 @@ class EventProcessor:
         return self._file_locks[file_path]
 
     def _load_action_mappings(self):
+        self._source_stats[self.actions_file] = self._stat_key(self.actions_file)
         try:
-            with open(self.actions_file, 'r') as f:
-                data = json.load(f)
+            with open(self.actions_file, 'rb') as f:
+                data = orjson.loads(f.read())
                 return ActionMapping.from_dict(data)
         except FileNotFoundError:
             logger.warning(f"Action mappings file not found at {self.actions_file}. No actions will be triggered.")
@@ -105,59 +168,115 @@ class EventProcessor:
             logger.error(f"Error decoding JSON from {self.actions_file}.")
             return ActionMapping()
 
-    async def _log_audit_entry(self, entry):
-        lock = self._get_lock(self.audit_log_file)
-        async with lock:
+    def _log_audit_entry(self, entry):
+        try:
+            self._audit_queue.put_nowait(entry)
+        except asyncio.QueueFull:
+            logger.warning(f"Audit queue is full; dropping audit entry for event {entry.event_id}.")
+            return
+        if self._audit_flusher is None or self._audit_flusher.done():
+            self._audit_flusher = asyncio.create_task(self._flush_audit())
+
+    async def _flush_audit(self):
+        """Writes queued audit entries, one write call per batch of whatever is pending."""
+        while True:
+            batch = await drain(self._audit_queue)
+            content = b''.join(entry.to_json_bytes() + b'\n' for entry in batch)
             try:
-                await asyncio.to_thread(self._write_to_log, entry.to_json() + '\n')
+                await asyncio.to_thread(self._write_to_log, content)
             except Exception as e:
                 logger.error(f"Failed to write to audit log {self.audit_log_file}: {e}")
 
-    def _write_to_log(self, content):
-        with open(self.audit_log_file, 'a') as f:
-            f.write(content)
+    def close(self):
+        """Writes out any audit entries still queued, closes the audit log and snapshots popups."""
+        pending = []
+        while not self._audit_queue.empty():
+            pending.append(self._audit_queue.get_nowait())
+        try:
+            if pending:
+                self._write_to_log(b''.join(entry.to_json_bytes() + b'\n' for entry in pending))
+        except Exception as e:
+            logger.error(f"Failed to write to audit log {self.audit_log_file}: {e}")
+        if self._audit_log is not None:
+            self._audit_log.close()
+            self._audit_log = None
+        self.popup_store.flush()
 
-    async def _atomic_write(self, file_path, data):
+    def _write_to_log(self, content):
+        if self._audit_log is None:
+            # Unbuffered: each batch goes to the OS in a single write
+            self._audit_log = open(self.audit_log_file, 'ab', buffering=0)
+        self._audit_log.write(content)
+
+    async def _atomic_write(self, file_path, data, durable=True):
+        """
+        Replaces file_path with data via temp file + rename. Non-durable writes skip the
+        fsync; they are still atomic for readers but may be lost on power failure, which
+        is fine for state that is regenerated from TM events.
+        """
         lock = self._get_lock(file_path)
         async with lock:
             try:
-                await asyncio.to_thread(self._write_atomic_file, file_path, data)
+                await asyncio.to_thread(self._write_atomic_file, file_path, data, durable)
                 logger.info(f"Successfully wrote to {file_path}")
             except Exception as e:
                 logger.error(f"Failed to atomically write to {file_path}: {e}")
 
-    def _write_atomic_file(self, file_path, data):
+    def _write_atomic_file(self, file_path, data, durable=True):
         temp_fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(file_path))
         try:
-            with os.fdopen(temp_fd, 'w') as temp_f:
+            with os.fdopen(temp_fd, 'wb' if isinstance(data, bytes) else 'w') as temp_f:
                 temp_f.write(data)
+                if durable:
+                    temp_f.flush()
+                    # Make the new contents durable before they replace the old file
+                    os.fsync(temp_f.fileno())
             os.rename(temp_path, file_path)
         except Exception as e:
             if os.path.exists(temp_path):
                 os.remove(temp_path)
             raise e
 
+    def _load_field_states(self):
+        """Reads the persisted field files once at startup to prime the registry."""
+        states = {}
+        for filename in os.listdir(self.fields_dir):
+            if not (filename.startswith('field') and filename.endswith('.json')):
+                continue
+            try:
+                state = FieldState.from_json(self._read_file(os.path.join(self.fields_dir, filename)))
+                states[state.field_id] = state
+            except (OSError, ValueError, TypeError) as e:
+                logger.error(f"Could not load field state from {filename}: {e}")
+        return states
+
     async def _get_field_state(self, field_id):
+        state = self.field_states.get(field_id)
+        if state is not None:
+            return state
+
+        # No lock needed: writers replace the file by rename, so a reader sees either the
+        # old or the new contents, and setdefault keeps the first state loaded.
         field_file = os.path.join(self.fields_dir, f"field{field_id}.json")
-        lock = self._get_lock(field_file)
-        async with lock:
-            try:
-                content = await asyncio.to_thread(self._read_file, field_file)
-                return FieldState.from_json(content)
-            except FileNotFoundError:
-                logger.info(f"No existing state for field {field_id}, creating new one.")
-                return FieldState(field_id=field_id, state="standby")
-            except json.JSONDecodeError:
-                logger.error(f"Could not decode JSON for field {field_id}, creating new one.")
-                return FieldState(field_id=field_id, state="standby")
+        state = await asyncio.to_thread(self._read_field_state, field_file, field_id)
+        return self.field_states.setdefault(field_id, state)
+
+    def _read_field_state(self, field_file, field_id):
+        try:
+            return FieldState.from_json(self._read_file(field_file))
+        except FileNotFoundError:
+            logger.info("No existing state for field %s, creating new one.", field_id)
+        except json.JSONDecodeError:
+            logger.error(f"Could not decode JSON for field {field_id}, creating new one.")
+        return FieldState(field_id=field_id, state="standby")
 
     def _read_file(self, file_path):
-        with open(file_path, 'r') as f:
+        with open(file_path, 'rb') as f:
             return f.read()
 
     async def _update_field_state(self, event):
         if not event.field:
-            logger.info(f"Event {event.id} has no field, skipping state update.")
+            logger.info("Event %s has no field, skipping state update.", event.id)
             return None, None
 
         field_id = event.field
@@ -168,28 +287,37 @@ class EventProcessor:
 
         # Update match name if applicable
         if event.type == "fieldMatchAssigned":
-            new_match_name = self._format_match_name(event.payload.get("match"))
+            match_obj = event.payload.get("match")
+            new_match_name = self._format_match_name(match_obj)
             if new_match_name != current_state.match_name:
                 current_state.match_name = new_match_name
                 is_dirty = True
+            new_match_id = match_obj if isinstance(match_obj, dict) else None
+            if new_match_id != current_state.match_id:
+                current_state.match_id = new_match_id
+                is_dirty = True
         
         # Determine and update the state
         new_state = self._determine_new_state(event, current_state)
         if new_state and new_state != current_state.state:
             current_state.state = new_state
             is_dirty = True
-            logger.info(f"Updated field {field_id} state to {new_state}")
+            logger.info("Updated field %s state to %s", field_id, new_state)
         
         # If any property changed, flush to disk
         if is_dirty:
             current_state.last_updated = event.timestamp
             field_file = os.path.join(self.fields_dir, f"field{field_id}.json")
-            await self._atomic_write(field_file, current_state.to_json())
+            # Field files are a cache of TM state and only need to be atomic, not durable
+            await self._atomic_write(field_file, current_state.to_json_bytes(), durable=False)
+            for listener in self.field_state_listeners:
+                listener()
             return previous_state_name, new_state or previous_state_name
         
         return None, None
 
-    def _format_match_name(self, match_obj):
+    @staticmethod
+    def _format_match_name(match_obj):
         if not match_obj:
             return None
 
@@ -203,27 +331,12 @@ class EventProcessor:
         if round_val is None:
             return None
 
-        round_map = {
-            # By string (lowercase)
-            "QUAL": "Q",
-            "TOP_N": "F",
-        }
-
-        round_prefix = None
-        if isinstance(round_val, int):
-            round_prefix = round_map.get(round_val)
-        elif isinstance(round_val, str):
-            round_prefix = round_map.get(round_val.lower())
-
-        if round_prefix is None:
-            logger.warning(f"Could not find a prefix for round '{round_val}'.")
-            # Fallback to first letter if it's a string
-            if isinstance(round_val, str) and len(round_val) > 0:
-                round_prefix = round_val[0].upper()
-            else:
-                return None # Cannot determine prefix
-
-        return f"{round_prefix}{match_obj.get('match', '')}"
+        match_num = match_obj.get('match', '')
+        try:
+            return _match_name_for(round_val, match_num)
+        except TypeError:
+            # Unhashable values from a malformed payload; format without the cache
+            return _match_name_for.__wrapped__(round_val, match_num)
 
     def _determine_new_state(self, event, current_state):
         # This logic will be based on the VEX TM API docs and the desired state flow
@@ -251,42 +364,44 @@ class EventProcessor:
         actions_to_run = []
         field_id = event.field
         match_name = None
+        field_state = None
 
         if field_id:
             field_state = await self._get_field_state(field_id)
             match_name = field_state.match_name
 
-        # If the event has a match name in its payload, it should take precedence
-        if event.payload and "match" in event.payload:
+        # If the event has a match name in its payload, it should take precedence.
+        # fieldMatchAssigned already stored exactly that name on the field state.
+        if event.payload and "match" in event.payload and not (event.type == "fieldMatchAssigned" and field_state is not None):
             formatted_match_name = self._format_match_name(event.payload.get("match"))
             if formatted_match_name:
                 match_name = formatted_match_name
         
         # Check for actions based on event type
         actions_to_run.extend(
-            self.action_mappings.get_actions(self.action_mappings.on_event, event.type, field_id, match_name, event.payload)
+            self.action_mappings.get_actions("on_event", event.type, field_id, match_name, event.payload)
         )
 
         # Check for actions based on state change
         if old_state and new_state and old_state != new_state:
             state_transition = f"{old_state}->{new_state}"
             actions_to_run.extend(
-                self.action_mappings.get_actions(self.action_mappings.on_state_change, state_transition, field_id, match_name)
+                self.action_mappings.get_actions("on_state_change", state_transition, field_id, match_name)
             )
 
         if actions_to_run:
-            logger.info(f"Found {len(actions_to_run)} actions to run for event {event.type} on field {field_id} (state: {old_state}->{new_state}, match: {match_name})")
+            logger.info("Found %s actions to run for event %s on field %s (state: %s->%s, match: %s)", len(actions_to_run), event.type, field_id, old_state, new_state, match_name)
 
         for action_data in actions_to_run:
-            await self._execute_action(action_data, event)
+            await self._execute_action(action_data, event, field_state)
 
-    async def _execute_action(self, action_data, event=None):
+    async def _execute_action(self, action_data, event=None, field_state=None):
         action_type = action_data.get("type")
         if not action_type:
             logger.warning("Action data is missing 'type'.")
             return
 
-        logger.debug(f"Executing action: {action_data}")
+        logger.debug("Executing action: %s", action_data)
 
         if action_type == "audio":
             if self.spotify_controller and not self.config.paused.get("audio"):
@@ -294,39 +409,41 @@ class EventProcessor:
                 action_data_copy["metadata"] = action_data_copy.get("metadata", {}).copy()
 
                 if action_data.get("command") == "play_playlist_track" and event and event.field:
-                    field_state = await self._get_field_state(event.field)
+                    if field_state is None:
+                        field_state = await self._get_field_state(event.field)
                     match_name = field_state.match_name
                     if match_name:
                         track_number = _extract_match_number(match_name)
                         if track_number is not None:
                             action_data_copy["metadata"]["track_number"] = track_number
-                            logger.info(f"Enriched action with track number: {track_number}")
+                            logger.info("Enriched action with track number: %s", track_number)
                     else:
-                        logger.warning(f"Could not determine match name for event {event.id} on field {event.field} to play track.")
+                        logger.warning("Could not determine match name for event %s on field %s to play track.", event.id, event.field)
 
                 action = AudioAction(**action_data_copy)
-                self.spotify_controller.execute_action(action)
+                self.spotify_batcher.submit(action)
             else:
                 logger.info("Skipping audio action because controller is not available or audio is paused.")
         
         elif action_type == "video":
             if self.atem_controller and not self.config.paused.get("video"):
-                # Map field_id to camera_id if not specified and event is available
+                # Map field_id to camera_id if not specified and event is available.
+                # Copy first: action_data is shared with the loaded action mappings.
                 if "camera_id" not in action_data and event and event.field:
-                    action_data["camera_id"] = self.config.field_to_camera.get(str(event.field))
+                    action_data = {**action_data, "camera_id": self.config.field_to_camera.get(str(event.field))}
                 
                 if action_data.get("camera_id"):
                     action = VideoAction(**action_data)
                     self.atem_controller.execute_action(action)
                 else:
-                    logger.warning(f"No camera_id for video action on event: {event.id if event else 'N/A'}")
+                    logger.warning("No camera_id for video action on event: %s", event.id if event else 'N/A')
             else:
                 logger.info("Skipping video action because controller is not available or video is paused.")
 
         elif action_type == "lighting":
             if self.zeros_controller and not self.config.paused.get("lighting"):
                 action = LightingAction(**action_data)
-                self.zeros_controller.execute_action(action)
+                self.zeros_batcher.submit(action)
             else:
                 logger.info("Skipping lighting action because controller is not available or lighting is paused.")
         
@@ -336,90 +453,109 @@ class EventProcessor:
 
     async def _handle_special_events(self, event):
         if event.type == "match_scheduled":
-            logger.info(f"Handling match_scheduled event: {event.payload}")
+            logger.info("Handling match_scheduled event: %s", event.payload)
             # This file is consumed by the frontend to show popups
-            await self._atomic_write(self.scheduled_matches_file, json.dumps(event.payload, indent=4))
+            await self._atomic_write(self.scheduled_matches_file, orjson.dumps(event.payload))
             return True
             
         if event.type == "manual_popup":
-            logger.info(f"Handling manual_popup event: {event.payload}")
+            logger.info("Handling manual_popup event: %s", event.payload)
             # This file holds a list of active popups
             # A real implementation would manage this list (add, remove expired)
-            popups = await self._read_popups()
-            popups.append(event.payload)
-            await self._atomic_write(self.popups_file, json.dumps(popups, indent=4))
+            await self._append_popup(event.payload)
             return True
         
         if event.type == "manual_action":
-            logger.info(f"Handling manual action: {event.payload}")
+            logger.info("Handling manual action: %s", event.payload)
             await self._execute_action(event.payload)
             return True
             
         return False
 
-    async def _read_popups(self):
+    async def _append_popup(self, popup):
         try:
-            async with self._get_lock(self.popups_file):
-                content = await asyncio.to_thread(self._read_file, self.popups_file)
-                return json.loads(content)
-        except (FileNotFoundError, json.JSONDecodeError):
-            return []
+            # Journals the popup; the full list is only rewritten when the store compacts
+            await asyncio.to_thread(self.popup_store.add, popup)
+        except Exception as e:
+            logger.error(f"Failed to store popup {popup.get('id')}: {e}")
 
     async def _find_active_field(self):
-        active_fields = []
-        try:
-            field_files = [f for f in os.listdir(self.fields_dir) if f.endswith('.json')]
-            for filename in field_files:
-                field_id = int(filename.replace('field', '').replace('.json', ''))
-                state = await self._get_field_state(field_id)
-                if state.state == 'active':
-                    active_fields.append(state)
-        except Exception as e:
-            logger.error(f"Error finding active fields: {e}")
-            return None
+        active_fields = [state for state in self.field_states.values() if state.state == 'active']
 
         if not active_fields:
             return None
 
         if len(active_fields) == 1:
-            logger.info(f"Found active field: {active_fields[0].field_id}")
+            logger.info("Found active field: %s", active_fields[0].field_id)
             return active_fields[0].field_id
 
         # Sort by last_updated timestamp descending to find the most recent
         active_fields.sort(key=lambda x: x.last_updated, reverse=True)
         
         latest_field = active_fields[0]
-        logger.info(f"Found multiple active fields. Selecting the most recent: {latest_field.field_id}")
+        logger.info("Found multiple active fields. Selecting the most recent: %s", latest_field.field_id)
         return latest_field.field_id
 
     async def process_events(self):
-        logger.info("Event processor started.")
+        logger.info(f"Event processor started with {EVENT_WORKERS} workers.")
+        worker_queues = [asyncio.Queue(maxsize=EVENT_QUEUE_MAXSIZE) for _ in range(EVENT_WORKERS)]
+        async with asyncio.TaskGroup() as tg:
+            for worker_queue in worker_queues:
+                tg.create_task(self._worker(worker_queue))
+            if self.atem_controller:
+                tg.create_task(self.atem_controller.monitor())
+            while True:
+                batch = await drain(self.event_queue)
+                # Pick up edits made through the web UI before dispatching the batch
+                self._reload_if_changed()
+                if len(batch) > 1:
+                    logger.debug("Dispatching batch of %s events", len(batch))
+                for event in batch:
+                    # Attribute before sharding, so the event is queued behind (not
+                    # alongside) the other events for the field whose state it changes
+                    await self._attribute_to_active_field(event)
+                    await worker_queues[self._shard(event)].put(event)
+
+    async def _attribute_to_active_field(self, event):
+        """Gives an audienceDisplayChanged event without a field the currently active field."""
+        if not event.field and event.type == "audienceDisplayChanged":
+            active_field = await self._find_active_field()
+            if active_field:
+                event.field = active_field
+                logger.info("Attributed audienceDisplayChanged event to active field %s", active_field)
+
+    @staticmethod
+    def _shard(event):
+        """Picks the worker for an event; events without a field all go to the first worker."""
+        if not event.field:
+            return 0
+        return hash(str(event.field)) % EVENT_WORKERS
+
+    async def _worker(self, worker_queue):
+        """Processes the events routed to one worker, in arrival order."""
         while True:
+            event = await worker_queue.get()
             try:
-                event = await self.event_queue.get()
-                logger.info(f"Processing event: {event.to_json()}")
-
-                # If the event is an audienceDisplayChanged without a field, find the active field
-                if not event.field and event.type == "audienceDisplayChanged":
-                    active_field = await self._find_active_field()
-                    if active_field:
-                        event.field = active_field
-                        logger.info(f"Attributed audienceDisplayChanged event to active field {active_field}")
+                await self._process_event(event)
+            except Exception as e:
+                logger.error(f"Error processing event: {e}", exc_info=True)
+            finally:
+                worker_queue.task_done()
+                self.event_queue.task_done()
 
-                # Handle special, non-field-related events first
-                if await self._handle_special_events(event):
-                    self.event_queue.task_done()
-                    continue
+    async def _process_event(self, event):
+        if logger.isEnabledFor(logging.INFO):
+            logger.info("Processing event: %s", event.to_json())
 
-                # 1. Update field state
-                old_state, new_state = await self._update_field_state(event)
+        # Handle special, non-field-related events first
+        if await self._handle_special_events(event):
+            return
 
-                # 2. Trigger actions based on the event itself AND any state change
-                await self._trigger_actions(event, old_state, new_state)
+        # 1. Update field state
+        old_state, new_state = await self._update_field_state(event)
 
-                self.event_queue.task_done()
-            except Exception as e:
-                logger.error(f"Error processing event: {e}", exc_info=True)
+        # 2. Trigger actions based on the event itself AND any state change
+        await self._trigger_actions(event, old_state, new_state)
 
 
 if __name__ == '__main__':
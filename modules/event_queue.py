@@ -0,0 +1,53 @@
+import asyncio
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Upper bound on queued events so bursty producers cannot grow memory without limit
+EVENT_QUEUE_MAXSIZE = 1024
+
+async def enqueue(queue, item, timeout=1.0):
+    """
+    Puts an item on the queue, avoiding a coroutine yield when there is room.
+    If the queue is full, waits up to `timeout` seconds for space.
+    Returns True if the item was queued, False if it had to be dropped.
+    """
+    try:
+        queue.put_nowait(item)
+        return True
+    except asyncio.QueueFull:
+        pass
+
+    try:
+        await asyncio.wait_for(queue.put(item), timeout=timeout)
+        return True
+    except asyncio.TimeoutError:
+        logger.warning(f"Event queue is full ({queue.qsize()} items); dropping {item!r}.")
+        return False
+
+def put_drop_oldest(queue, item):
+    """
+    Puts an item without ever waiting. If the queue is full, the oldest queued item
+    is discarded to make room. Returns the discarded item, or None.
+    """
+    try:
+        queue.put_nowait(item)
+        return None
+    except asyncio.QueueFull:
+        pass
+
+    dropped = queue.get_nowait()
+    # The dropped item will never be processed; keep join() accounting balanced
+    queue.task_done()
+    queue.put_nowait(item)
+    return dropped
+
+async def drain(queue, max_items=256):
+    """
+    Waits for at least one item, then takes whatever else is already queued
+    (up to `max_items` in total) without yielding again.
+    """
+    items = [await queue.get()]
+    for _ in range(min(max_items - 1, queue.qsize())):
+        items.append(queue.get_nowait())
+    return items
@@ -0,0 +1,145 @@
+import copy
+import json
+import logging
+import orjson
+import os
+import tempfile
+import threading
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+# How long a change may sit in memory before it is written out
+FLUSH_DELAY_S = 0.2
+
+class JsonDocument:
+    """
+    A JSON file kept in memory, with writes coalesced onto a short debounce timer.
+
+    Reads come from memory; the file is only re-parsed when its mtime or size shows
+    it was edited by something else since it was last read or written. Changes are made inside `batch()`, which marks
+    the document dirty when it exits; the file is rewritten at most once per
+    FLUSH_DELAY_S however many changes land in that window. Nested batches only
+    schedule the flush when the outermost one exits.
+
+    The flush timer is a non-daemon thread, so a pending write still lands when
+    the interpreter shuts down.
+    """
+    def __init__(self, file_path, default=None, flush_delay_s=FLUSH_DELAY_S, indent=True):
+        self.file_path = file_path
+        self._default = default if default is not None else {}
+        self.flush_delay_s = flush_delay_s
+        self._dump_option = orjson.OPT_INDENT_2 if indent else 0
+        self._lock = threading.RLock()
+        # Held from serializing to replacing the file so flushes land in order
+        self._write_lock = threading.Lock()
+        self._batch_depth = 0
+        self._dirty = False
+        self._timer = None
+        self._source_stat = None
+        # Bumped on every change to the in-memory document; used for HTTP ETags
+        self.version = 0
+        self._data = self._read()
+
+    def _stat_key(self):
+        try:
+            st = os.stat(self.file_path)
+            return (st.st_mtime_ns, st.st_size)
+        except FileNotFoundError:
+            return None
+
+    def _read(self):
+        self.version += 1
+        self._source_stat = self._stat_key()
+        try:
+            with open(self.file_path, 'rb') as f:
+                return orjson.loads(f.read())
+        except (FileNotFoundError, json.JSONDecodeError):
+            return copy.deepcopy(self._default)
+
+    def get(self):
+        """Returns the in-memory document. Treat it as read-only outside `batch()`."""
+        self.refresh()
+        return self._data
+
+    def refresh(self):
+        """Re-reads the file if it was edited by something else since it was last read or written."""
+        if not self._dirty and self._stat_key() != self._source_stat:
+            with self._lock:
+                # Unflushed changes win over an outside edit; they are written next anyway
+                if not self._dirty and self._stat_key() != self._source_stat:
+                    logger.info(f"{self.file_path} changed on disk, reloading.")
+                    self._data = self._read()
+
+    @contextmanager
+    def batch(self):
+        """Yields the live document for in-place changes and schedules one flush on exit."""
+        with self._lock:
+            self._batch_depth += 1
+            try:
+                yield self._data
+            finally:
+                self._batch_depth -= 1
+                self._dirty = True
+                self.version += 1
+                if self._batch_depth == 0:
+                    self._schedule_flush()
+
+    def replace(self, data):
+        with self._lock:
+            self._data = data
+            self._dirty = True
+            self.version += 1
+            if self._batch_depth == 0:
+                self._schedule_flush()
+
+    def reload(self):
+        """Adopts the file as edited outside the document, discarding unflushed changes."""
+        with self._lock:
+            self._cancel_timer()
+            self._dirty = False
+            self._data = self._read()
+
+    def _schedule_flush(self):
+        """Caller holds the lock."""
+        if self._timer is None:
+            self._timer = threading.Timer(self.flush_delay_s, self.flush)
+            self._timer.start()
+
+    def _cancel_timer(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+
+    def flush(self):
+        """Writes the document now if it has unflushed changes."""
+        with self._write_lock:
+            with self._lock:
+                self._cancel_timer()
+                if not self._dirty:
+                    return
+                try:
+                    payload = orjson.dumps(self._data, option=self._dump_option)
+                except TypeError as e:
+                    logger.error(f"Failed to serialize {self.file_path}: {e}")
+                    return
+                self._dirty = False
+            # Changes made while the file is written just schedule the next flush
+            self._write(payload)
+
+    def _write(self, payload):
+        try:
+            temp_fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(self.file_path))
+            try:
+                with os.fdopen(temp_fd, 'wb') as temp_f:
+                    temp_f.write(payload)
+                os.replace(temp_path, self.file_path)
+                # Our own write is not an outside edit
+                self._source_stat = self._stat_key()
+            except Exception:
+                if os.path.exists(temp_path):
+                    os.remove(temp_path)
+                raise
+            logger.info(f"Successfully wrote to {self.file_path}")
+        except Exception as e:
+            logger.error(f"Failed to atomically write to {self.file_path}: {e}")
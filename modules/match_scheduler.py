@@ -1,18 +1,26 @@
 import asyncio
+import bisect
 import json
+import orjson
 import logging
 import os
-from datetime import datetime, timedelta
 import tempfile
 import uuid
 
-from models.events import Event
 from models.config import Config
+from modules.popup_store import get_popup_store
 
 logger = logging.getLogger(__name__)
 
+# path -> (st_mtime_ns, st_size, parsed JSON); reused until the file changes on disk
+_parsed_cache = {}
+
+def _stat_key(file_path):
+    st = os.stat(file_path)
+    return st.st_mtime_ns, st.st_size
+
 class MatchScheduler:
-    def __init__(self, event_queue, storage_path='storage', interval=10):
+    def __init__(self, event_queue, storage_path='storage', interval=10, field_registry=None):
         self.event_queue = event_queue
         self.storage_path = storage_path
         self.schedule_file = os.path.join(self.storage_path, 'schedule.json')
@@ -20,16 +28,36 @@ class MatchScheduler:
         self.fields_dir = os.path.join(self.storage_path, 'fields')
         self.notified_matches_file = os.path.join(self.storage_path, 'notified_matches.json')
         self.popups_file = os.path.join(self.storage_path, 'popups.json')
+        self.popup_store = get_popup_store(self.popups_file)
         self.interval = interval
+        # Live field_id -> FieldState mapping owned by the EventProcessor; when absent
+        # the field files are scanned instead.
+        self.field_registry = field_registry
+        # Set when field states change so the next check runs immediately
+        self._wakeup = asyncio.Event()
         self.running = False
         self.notified_matches = self._load_notified_matches()
+        # Parsed config dict the cached Config was built from
+        self._config_source = None
+        self._config = Config()
+        # team number -> ((room position in config, room_id), ...) for the cached Config
+        self._team_to_rooms = {}
+        # Parsed schedule the match index was built from
+        self._schedule_source = None
+        # div_id -> (sorted match numbers, [(match_num, match_info), ...] in the same order)
+        self._matches_by_div = {}
+
+    async def _atomic_write(self, file_path, data):
+        await asyncio.to_thread(self._write_json_file, file_path, data)
 
-    def _atomic_write(self, file_path, data):
+    def _write_json_file(self, file_path, data):
         try:
             temp_fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(file_path))
-            with os.fdopen(temp_fd, 'w') as temp_f:
-                json.dump(data, temp_f, indent=4)
+            with os.fdopen(temp_fd, 'wb') as temp_f:
+                temp_f.write(orjson.dumps(data))
             os.replace(temp_path, file_path)
+            # Seed the parse cache so the next load skips reading back what we just wrote
+            _parsed_cache[file_path] = (*_stat_key(file_path), data)
             logger.debug(f"Successfully wrote to {file_path}")
         except Exception as e:
             logger.error(f"Failed to atomically write to {file_path}: {e}")
@@ -38,91 +66,161 @@ class MatchScheduler:
 
     def _load_notified_matches(self):
         try:
-            with open(self.notified_matches_file, 'r') as f:
-                return set(json.load(f))
+            with open(self.notified_matches_file, 'rb') as f:
+                return set(orjson.loads(f.read()))
         except (FileNotFoundError, json.JSONDecodeError):
             return set()
 
-    def _save_notified_matches(self):
-        self._atomic_write(self.notified_matches_file, list(self.notified_matches))
+    async def _save_notified_matches(self):
+        await self._atomic_write(self.notified_matches_file, list(self.notified_matches))
 
     def _load_json(self, file_path):
+        """
+        Loads a JSON file, reusing the previous parse while its mtime and size are unchanged.
+        The returned object is shared with the cache and must not be mutated.
+        """
         try:
-            with open(file_path, 'r') as f:
-                return json.load(f)
+            key = _stat_key(file_path)
+        except FileNotFoundError:
+            _parsed_cache.pop(file_path, None)
+            return None
+
+        cached = _parsed_cache.get(file_path)
+        if cached is not None and cached[:2] == key:
+            return cached[2]
+
+        try:
+            with open(file_path, 'rb') as f:
+                data = orjson.loads(f.read())
         except (FileNotFoundError, json.JSONDecodeError):
             return None
+        _parsed_cache[file_path] = (*key, data)
+        return data
+
+    async def _load_json_async(self, file_path):
+        return await asyncio.to_thread(self._load_json, file_path)
+
+    async def _load_config(self):
+        config_data = await self._load_json_async(self.config_file)
+        # Only rebuild the Config when the underlying parse changed
+        if config_data is not self._config_source:
+            self._config = Config.from_dict(config_data) if config_data else Config()
+            self._config_source = config_data
+            team_to_rooms = {}
+            for position, (room_id, room_data) in enumerate(self._config.rooms.items()):
+                for team in room_data.get("teams", []):
+                    team_to_rooms.setdefault(team, []).append((position, room_id))
+            self._team_to_rooms = team_to_rooms
+        return self._config
+
+    def _index_schedule(self, schedule):
+        """Indexes each division's matches by number; rebuilt only when the schedule changes."""
+        if schedule is self._schedule_source:
+            return self._matches_by_div
+
+        matches_by_div = {}
+        for division in schedule["divisions"]:
+            entries = []
+            for match in division.get("matches", []):
+                match_info = match.get("matchInfo", {})
+                match_num = match_info.get("matchTuple", {}).get("match")
+                if match_num:
+                    entries.append((match_num, match_info))
+            entries.sort(key=lambda entry: entry[0])
+            matches_by_div[division["id"]] = ([num for num, _ in entries], entries)
+
+        self._matches_by_div = matches_by_div
+        self._schedule_source = schedule
+        return matches_by_div
+
+    def _rooms_for_teams(self, teams):
+        """Rooms following any of the given teams, in config order."""
+        rooms = set()
+        for team in teams:
+            rooms.update(self._team_to_rooms.get(team, ()))
+        return [room_id for _, room_id in sorted(rooms)]
+
+    def _iter_field_states(self):
+        """Yields (state, match_id) for every known field."""
+        if self.field_registry is not None:
+            for field_state in list(self.field_registry.values()):
+                yield field_state.state, field_state.match_id
+            return
 
-    def _get_active_match_numbers(self):
-        active_matches = {}
         if not os.path.exists(self.fields_dir):
-            return active_matches
-        
+            return
         for filename in os.listdir(self.fields_dir):
             if filename.endswith(".json"):
                 state = self._load_json(os.path.join(self.fields_dir, filename))
-                if state and state.get('state') in ['active', 'queued', 'finish']:
-                    match_info = state.get('match_id')
-                    if match_info:
-                        # Assuming match_id is a dict like {"match": 1, ...}
-                        match_num = match_info.get('match')
-                        div_id = match_info.get('division')
-                        if div_id not in active_matches:
-                            active_matches[div_id] = set()
-                        active_matches[div_id].add(match_num)
+                if state:
+                    yield state.get('state'), state.get('match_id')
+
+    def _get_active_match_numbers(self):
+        active_matches = {}
+        for state, match_info in self._iter_field_states():
+            if state in ['active', 'queued', 'finish'] and isinstance(match_info, dict):
+                # match_id is a dict like {"division": 1, "match": 1, ...}
+                match_num = match_info.get('match')
+                div_id = match_info.get('division')
+                if div_id not in active_matches:
+                    active_matches[div_id] = set()
+                active_matches[div_id].add(match_num)
         return active_matches
 
+    def notify(self):
+        """Requests a schedule check now, e.g. because a field moved to a new match."""
+        self._wakeup.set()
+
     async def run(self):
-        """Periodically checks the schedule and queues matches that are about to start."""
-        logger.info(f"Match scheduler started. Will check every {self.interval} seconds.")
+        """Checks the schedule whenever field states change, and at least every `interval` seconds."""
+        logger.info(f"Match scheduler started. Will check on field changes and at least every {self.interval} seconds.")
         while True:
             await self.check_schedule()
-            await asyncio.sleep(self.interval)
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
 
     async def check_schedule(self):
         try:
-            config_data = self._load_json(self.config_file)
-            config = Config.from_dict(config_data) if config_data else Config()
+            config = await self._load_config()
 
             if config.match_queue_pause and config.match_queue_pause.get('start'):
                 logger.info("Match scheduling is currently paused via config.")
                 return
 
-            schedule = self._load_json(self.schedule_file)
+            schedule = await self._load_json_async(self.schedule_file)
             if not schedule or "divisions" not in schedule:
                 logger.warning("Schedule not found or invalid. Skipping scheduling run.")
                 return
 
-            active_matches_by_div = self._get_active_match_numbers()
+            if self.field_registry is not None:
+                active_matches_by_div = self._get_active_match_numbers()
+            else:
+                # Without the live registry this scans the field files on disk
+                active_matches_by_div = await asyncio.to_thread(self._get_active_match_numbers)
             lead_matches = config.schedule_lead_matches
-            popups = self._load_json(self.popups_file) or []
+            new_popups = []
+            notified_dirty = False
 
-            for division in schedule["divisions"]:
-                div_id = division["id"]
+            for div_id, (match_nums, entries) in self._index_schedule(schedule).items():
                 active_match_nums = active_matches_by_div.get(div_id, set())
                 
                 last_played_match_num = max(active_match_nums) if active_match_nums else 0
 
-                for match in division.get("matches", []):
-                    match_info = match.get("matchInfo", {})
-                    match_tuple = match_info.get("matchTuple", {})
-                    match_num = match_tuple.get("match")
-                    
-                    if not match_num:
-                        continue
-
-                    is_upcoming = last_played_match_num < match_num <= last_played_match_num + lead_matches
+                # Only the window (last_played, last_played + lead] can be upcoming
+                start = bisect.bisect_right(match_nums, last_played_match_num)
+                end = bisect.bisect_right(match_nums, last_played_match_num + lead_matches)
+                for match_num, match_info in entries[start:end]:
                     notification_key = f"{div_id}-{match_num}"
 
-                    if is_upcoming and notification_key not in self.notified_matches:
+                    if notification_key not in self.notified_matches:
                         logger.info(f"Match {match_num} in division {div_id} is upcoming. Creating popup notification.")
                         
                         teams_in_match = [team['number'] for alliance in match_info.get('alliances', []) for team in alliance.get('teams', [])]
                         
-                        rooms_for_match = []
-                        for room_id, room_data in config.rooms.items():
-                            if any(team in room_data.get("teams", []) for team in teams_in_match):
-                                rooms_for_match.append(room_id)
+                        rooms_for_match = self._rooms_for_teams(teams_in_match)
 
                         if rooms_for_match:
                             popup_title = f"Upcoming Match: {match_num}"
@@ -136,12 +234,16 @@ class MatchScheduler:
                                 "type": "toast",
                                 "source": "match_scheduler"
                             }
-                            popups.append(popup)
+                            new_popups.append(popup)
                             
                             self.notified_matches.add(notification_key)
+                            notified_dirty = True
             
-            self._atomic_write(self.popups_file, popups)
-            self._save_notified_matches()
+            # Idle ticks change nothing, so they write nothing
+            if new_popups:
+                await asyncio.to_thread(self.popup_store.add_many, new_popups)
+            if notified_dirty:
+                await self._save_notified_matches()
         except Exception as e:
             logger.error(f"An error occurred in the match scheduler loop: {e}", exc_info=True)
 
@@ -0,0 +1,188 @@
+import json
+import logging
+import orjson
+import os
+import tempfile
+import threading
+import time
+import uuid
+
+logger = logging.getLogger(__name__)
+
+# Rewrite the snapshot after this many journaled changes, or once it is this old
+COMPACT_EVERY_OPS = 50
+COMPACT_EVERY_S = 30.0
+
+_stores = {}
+_stores_lock = threading.Lock()
+
+def get_popup_store(snapshot_file):
+    """Returns the process-wide PopupStore for a snapshot file, creating it on first use."""
+    path = os.path.abspath(snapshot_file)
+    with _stores_lock:
+        store = _stores.get(path)
+        if store is None:
+            store = _stores[path] = PopupStore(path)
+        return store
+
+def _with_id(popup):
+    """Every stored popup has an id, so lookups can index it directly."""
+    if "id" in popup:
+        return popup
+    return {**popup, "id": str(uuid.uuid4())}
+
+class PopupStore:
+    """
+    The active popups list, kept in memory and persisted as a snapshot plus a journal.
+
+    The snapshot (popups.json) is a plain JSON list of popups. Changes since it was
+    written are appended to a journal next to it, one JSON line per change, and the
+    snapshot is only rewritten (and the journal truncated) every few changes. On load,
+    the journal is replayed on top of the snapshot.
+
+    Methods are thread-safe: the web server calls in from its worker threads.
+    """
+    def __init__(self, snapshot_file):
+        self.snapshot_file = snapshot_file
+        self.journal_file = snapshot_file + '.journal'
+        self._lock = threading.Lock()
+        self._popups = []
+        self._ids = set()
+        # Bumped on every change to the list; used for HTTP ETags
+        self.version = 0
+        self._pending_ops = 0
+        self._last_compacted = time.monotonic()
+        os.makedirs(os.path.dirname(snapshot_file), exist_ok=True)
+        self._load()
+
+    def _load(self):
+        self.version += 1
+        try:
+            with open(self.snapshot_file, 'rb') as f:
+                popups = orjson.loads(f.read())
+            self._popups = [_with_id(p) for p in popups] if isinstance(popups, list) else []
+        except (FileNotFoundError, json.JSONDecodeError):
+            self._popups = []
+        self._ids = {p["id"] for p in self._popups}
+
+        try:
+            with open(self.journal_file, 'rb') as f:
+                for line in f:
+                    try:
+                        self._apply(orjson.loads(line))
+                        self._pending_ops += 1
+                    except json.JSONDecodeError:
+                        # A torn final line from a crash mid-append; everything before it is intact
+                        logger.warning(f"Skipping unreadable line in {self.journal_file}.")
+        except FileNotFoundError:
+            pass
+
+    def _apply(self, op):
+        kind = op.get("op")
+        if kind == "add":
+            popup = _with_id(op["popup"])
+            # Replaying a journal that was already folded into the snapshot must not duplicate
+            if popup["id"] not in self._ids:
+                self._popups.append(popup)
+                self._ids.add(popup["id"])
+            return True
+        if kind == "remove":
+            popup_id = op["id"]
+            if popup_id not in self._ids:
+                return False
+            self._popups = [p for p in self._popups if p["id"] != popup_id]
+            self._ids.discard(popup_id)
+            return True
+        if kind == "remove_many":
+            ids = frozenset(op["ids"]) & self._ids
+            if not ids:
+                return False
+            self._popups = [p for p in self._popups if p["id"] not in ids]
+            self._ids -= ids
+            return True
+        if kind == "clear":
+            self._popups = []
+            self._ids = set()
+            return True
+        return False
+
+    def _record(self, op):
+        """Applies a change and journals it. Caller holds the lock."""
+        if not self._apply(op):
+            return False
+        self.version += 1
+        try:
+            with open(self.journal_file, 'ab') as f:
+                f.write(orjson.dumps(op) + b'\n')
+            self._pending_ops += 1
+        except OSError as e:
+            logger.error(f"Failed to append to {self.journal_file}: {e}")
+        if self._pending_ops >= COMPACT_EVERY_OPS or time.monotonic() - self._last_compacted >= COMPACT_EVERY_S:
+            self._compact()
+        return True
+
+    def _compact(self):
+        """Writes the full list as the snapshot and truncates the journal. Caller holds the lock."""
+        try:
+            temp_fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(self.snapshot_file))
+            try:
+                with os.fdopen(temp_fd, 'wb') as temp_f:
+                    temp_f.write(orjson.dumps(self._popups))
+                    temp_f.flush()
+                    os.fsync(temp_f.fileno())
+                os.replace(temp_path, self.snapshot_file)
+            except Exception:
+                if os.path.exists(temp_path):
+                    os.remove(temp_path)
+                raise
+            # Only drop the journal once the snapshot containing its changes is in place
+            open(self.journal_file, 'w').close()
+            self._pending_ops = 0
+            self._last_compacted = time.monotonic()
+            logger.debug(f"Compacted popups into {self.snapshot_file}")
+        except Exception as e:
+            logger.error(f"Failed to write popups snapshot {self.snapshot_file}: {e}")
+
+    def list(self):
+        with self._lock:
+            return list(self._popups)
+
+    def add(self, popup):
+        with self._lock:
+            self._record({"op": "add", "popup": _with_id(popup)})
+
+    def add_many(self, popups):
+        with self._lock:
+            for popup in popups:
+                self._record({"op": "add", "popup": _with_id(popup)})
+
+    def remove(self, popup_id):
+        """Removes a popup by id. Returns False if no popup had that id."""
+        with self._lock:
+            return self._record({"op": "remove", "id": popup_id})
+
+    def remove_many(self, popup_ids):
+        """Removes several popups as one journaled change. Returns the ids that were found."""
+        with self._lock:
+            found = frozenset(popup_ids) & self._ids
+            if found:
+                self._record({"op": "remove_many", "ids": list(found)})
+            return found
+
+    def clear(self):
+        with self._lock:
+            self._record({"op": "clear"})
+            self._compact()
+
+    def reload(self):
+        """Adopts popups.json as edited outside the store, discarding unsnapshotted changes."""
+        with self._lock:
+            open(self.journal_file, 'w').close()
+            self._pending_ops = 0
+            self._load()
+
+    def flush(self):
+        """Folds any journaled changes into the snapshot."""
+        with self._lock:
+            if self._pending_ops:
+                self._compact()
@@ -1,49 +1,103 @@
-import requests
+import aiohttp
+import asyncio
+import email.utils
 import hmac
-import hashlib
-import base64
 import logging
-from datetime import datetime, timezone, timedelta
+import random
+import time
 from urllib.parse import urlparse
 
 logger = logging.getLogger(__name__)
 logger.setLevel(logging.DEBUG)
 
+# (epoch second, RFC 1123 date) for the last x-tm-date handed out
+_http_date = (None, '')
+
+def rfc1123_now():
+    """
+    Current time in the RFC 1123 format used by the x-tm-date header.
+
+    The value only changes once per second, so it is formatted once per second and
+    reused. formatdate is locale-independent, unlike strftime's %a/%b.
+    """
+    global _http_date
+    sec = int(time.time())
+    cached_sec, date = _http_date
+    if sec != cached_sec:
+        date = email.utils.formatdate(sec, usegmt=True)
+        _http_date = (sec, date)
+    return date
+
+# Gateway errors worth retrying, with exponential backoff between attempts
+_RETRY_STATUSES = frozenset({502, 503, 504})
+_MAX_ATTEMPTS = 3
+_BACKOFF_BASE_S = 0.3
+
 class VexTmApiClient:
-    def __init__(self, client_id, client_secret, api_key, base_url):
+    def __init__(self, client_id, client_secret, api_key, base_url, session=None):
         self.client_id = client_id
         self.client_secret = client_secret
         self.api_key = api_key.strip() if api_key else api_key
+        # Keyed OpenSSL HMAC state (named digest), copied per signature so the key setup runs only once
+        self._hmac_template = hmac.new(self.api_key.encode(), digestmod='sha256') if self.api_key else None
         self.base_url = base_url
+        # One pooled aiohttp session keeps connections alive between the token and API
+        # requests. It is created on first use, since it must belong to the running loop.
+        self.session = session
+        # endpoint -> (ETag, Last-Modified, parsed body) of the last full response
+        self._validators = {}
         self.token = None
-        self.token_expires = datetime.now(timezone.utc)
+        # time.monotonic() deadline after which the token must be refreshed
+        self._token_deadline = 0.0
+        # Held while a token request is in flight, so concurrent callers share its result
+        self._token_lock = asyncio.Lock()
+
+    def _get_session(self):
+        if self.session is None or self.session.closed:
+            self.session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=8, keepalive_timeout=75),
+                timeout=aiohttp.ClientTimeout(total=10)
+            )
+        return self.session
+
+    async def close(self):
+        """Closes the pooled connections held by the session."""
+        if self.session is not None and not self.session.closed:
+            await self.session.close()
 
-    def get_auth_token(self):
+    async def get_auth_token(self):
         """
         Retrieves an OAuth2 token from the VEX TM authentication server.
         """
-        if self.token and self.token_expires > datetime.now(timezone.utc):
+        if self.token and time.monotonic() < self._token_deadline:
             logger.debug("Reusing existing auth token.")
             return self.token
 
+        async with self._token_lock:
+            # Another caller may have refreshed the token while we waited for the lock
+            if self.token and time.monotonic() < self._token_deadline:
+                return self.token
+            return await self._request_auth_token()
+
+    async def _request_auth_token(self):
         logger.info("Requesting new auth token for VEX TM API.")
         url = "https://auth.vextm.dwabtech.com/oauth2/token"
         
         try:
-            response = requests.post(
+            async with self._get_session().post(
                 url,
-                auth=(self.client_id, self.client_secret),
-                data={"grant_type": "client_credentials"},
-                timeout=10  # Add a 10-second timeout
-            )
-            response.raise_for_status()
-            token_data = response.json()
+                auth=aiohttp.BasicAuth(self.client_id, self.client_secret),
+                data={"grant_type": "client_credentials"}
+            ) as response:
+                response.raise_for_status()
+                token_data = await response.json(content_type=None)
             self.token = token_data["access_token"]
             expires_in = token_data.get("expires_in", 3600)
-            self.token_expires = datetime.now(timezone.utc) + timedelta(seconds=expires_in - 60)
+            # Refresh about a minute early, jittered so clients don't all refresh in step
+            self._token_deadline = time.monotonic() + expires_in - 60 + random.uniform(-10, 10)
             logger.info("Successfully obtained new VEX TM auth token.")
             return self.token
-        except requests.exceptions.RequestException as e:
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
             logger.error(f"Error obtaining VEX TM auth token: {e}")
             self.token = None
             return None
@@ -58,8 +112,6 @@ class VexTmApiClient:
                        "host:" + Host header value + "\n" +
                        "x-tm-date:" + {Date} + "\n"
         """
-        if not self.token:
-            self.get_auth_token()
         if not self.token:
             raise Exception("Cannot create signature without an auth token.")
 
@@ -71,25 +123,43 @@ class VexTmApiClient:
             f"x-tm-date:{date}\n"
         )
         
-        logger.debug(f"String to sign:\n{repr(string_to_sign)}")
-        logger.debug(f"API key length: {len(self.api_key)}")
-        logger.debug(f"API key (first 10 chars): {self.api_key[:10]}...")
+        logger.debug("String to sign:\n%r", string_to_sign)
+        logger.debug("API key length: %s", len(self.api_key))
+        logger.debug("API key (first 10 chars): %s...", self.api_key[:10])
         
-        signature = hmac.new(
-            self.api_key.encode(),
-            string_to_sign.encode(),
-            hashlib.sha256
-        ).hexdigest()
+        mac = self._hmac_template.copy()
+        mac.update(string_to_sign.encode())
+        signature = mac.hexdigest()
         
-        logger.debug(f"Generated HMAC-SHA256 signature: {signature}")
-        return signature
+        logger.debug("Generated HMAC-SHA256 signature: %s", signature)
         return signature
 
-    def get(self, endpoint):
+    def prepare_signer(self, http_verb, uri_path, host):
+        """
+        Returns a function mapping a date to the signature create_signature would give
+        for the same verb, path and host with the current token. Everything before the
+        date is hashed once here; each call only hashes the date line.
+        """
+        if not self.token:
+            raise Exception("Cannot create signature without an auth token.")
+
+        prefix_mac = self._hmac_template.copy()
+        prefix_mac.update(f"{http_verb.upper()}\n{uri_path}\ntoken:{self.token}\nhost:{host}\nx-tm-date:".encode())
+
+        def sign(date):
+            mac = prefix_mac.copy()
+            mac.update(f"{date}\n".encode())
+            return mac.hexdigest()
+        return sign
+
+    async def get(self, endpoint):
         """
         Makes an authenticated and signed GET request to the VEX TM API.
+
+        Requests are conditional when an earlier response carried validators; on a
+        304 the previously parsed body is returned, which callers must not mutate.
         """
-        self.get_auth_token()
+        await self.get_auth_token()
         if not self.token:
             logger.error(f"Cannot make GET request to {endpoint}, no auth token.")
             return None
@@ -99,21 +169,45 @@ class VexTmApiClient:
         host = parsed_url.netloc
         uri_path = parsed_url.path
         
-        date = datetime.now(timezone.utc).strftime("%a, %d %b %Y %H:%M:%S GMT")
-        signature = self.create_signature("GET", uri_path, host, date)
+        sign = self.prepare_signer("GET", uri_path, host)
 
         headers = {
             "Host": host,
             "Authorization": f"Bearer {self.token}",
-            "x-tm-date": date,
-            "x-tm-signature": signature
         }
+        cached = self._validators.get(endpoint)
+        if cached is not None:
+            etag, last_modified, _ = cached
+            if etag:
+                headers["If-None-Match"] = etag
+            if last_modified:
+                headers["If-Modified-Since"] = last_modified
 
         try:
             logger.info(f"Making GET request to {url}")
-            response = requests.get(url, headers=headers, timeout=10)  # Add a 10-second timeout
-            response.raise_for_status()
-            return response.json()
-        except requests.exceptions.RequestException as e:
+            for attempt in range(_MAX_ATTEMPTS):
+                # Each attempt is signed with its own date so a retry is not stale
+                date = rfc1123_now()
+                headers["x-tm-date"] = date
+                headers["x-tm-signature"] = sign(date)
+                async with self._get_session().get(url, headers=headers) as response:
+                    if response.status in _RETRY_STATUSES and attempt < _MAX_ATTEMPTS - 1:
+                        logger.warning(f"GET {url} returned {response.status}; retrying.")
+                    elif response.status == 304 and cached is not None:
+                        logger.debug("GET %s not modified; reusing cached body.", url)
+                        return cached[2]
+                    else:
+                        response.raise_for_status()
+                        body = await response.json(content_type=None)
+                        etag = response.headers.get("ETag")
+                        last_modified = response.headers.get("Last-Modified")
+                        if etag or last_modified:
+                            self._validators[endpoint] = (etag, last_modified, body)
+                        else:
+                            self._validators.pop(endpoint, None)
+                        return body
+                await asyncio.sleep(_BACKOFF_BASE_S * 2 ** attempt)
+        # ValueError covers a body that is not valid JSON
+        except (aiohttp.ClientError, asyncio.TimeoutError, ValueError) as e:
             logger.error(f"Error during GET request to {url}: {e}")
             return None
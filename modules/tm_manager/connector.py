@@ -1,13 +1,14 @@
 import asyncio
 import websockets
 import json
+import orjson
 import os
 import logging
 from urllib.parse import urlparse
-from datetime import datetime, timezone
 
 from models.events import Event
-from .api_client import VexTmApiClient
+from modules.event_queue import put_drop_oldest
+from .api_client import VexTmApiClient, rfc1123_now
 
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
@@ -20,66 +21,68 @@ class VexTmConnector:
         self.base_url = base_url
         self.field_set_id = field_set_id
 
+        # Parse the base URL to construct the websocket URL
+        parsed_base = urlparse(self.base_url)
+        logger.debug("Base URL parsed - scheme: %s, hostname: %s, port: %s", parsed_base.scheme, parsed_base.hostname, parsed_base.port)
+
+        # Determine websocket scheme based on HTTP/HTTPS
+        ws_scheme = "wss" if parsed_base.scheme == "https" else "ws"
+
+        # Construct the URI path for the field set websocket
+        self._uri_path = f"/api/fieldsets/{self.field_set_id}"
+
+        # Use hostname without port for standard ports (80/443), otherwise include port.
+        # The host value for signature MUST match what will be in the Host header, and
+        # for websockets the port is in the Host header whenever it is in the URL.
+        if parsed_base.port:
+            self._host = f"{parsed_base.hostname}:{parsed_base.port}"
+        else:
+            self._host = parsed_base.hostname
+
+        # Build the complete websocket URL
+        self._ws_url = f"{ws_scheme}://{self._host}{self._uri_path}"
+
     async def connect(self):
         """
         Connects to the VEX TM Field Set Websocket and listens for events.
         Rebuilt from scratch following VEX API documentation precisely.
         """
         # Ensure we have a valid auth token
-        self.api_client.get_auth_token()
+        await self.api_client.get_auth_token()
         if not self.api_client.token:
             logger.error("Cannot connect to websocket without an auth token.")
             return
 
-        # Parse the base URL to construct the websocket URL
-        parsed_base = urlparse(self.base_url)
-        
-        # Determine websocket scheme based on HTTP/HTTPS
-        ws_scheme = "wss" if parsed_base.scheme == "https" else "ws"
-        
-        # Construct the URI path for the field set websocket
-        uri_path = f"/api/fieldsets/{self.field_set_id}"
-        
-        # Build the complete websocket URL
-        # Use hostname without port for standard ports (80/443), otherwise include port
-        if parsed_base.port:
-            ws_host = f"{parsed_base.hostname}:{parsed_base.port}"
-        else:
-            ws_host = parsed_base.hostname
-        
-        ws_url = f"{ws_scheme}://{ws_host}{uri_path}"
-        
-        logger.debug(f"Websocket URL constructed: {ws_url}")
-        logger.debug(f"Base URL parsed - scheme: {parsed_base.scheme}, hostname: {parsed_base.hostname}, port: {parsed_base.port}")
-        
+        logger.debug("Websocket URL constructed: %s", self._ws_url)
+
+        # Signer for the handshake, rebuilt whenever the token changes
+        signer = None
+        signer_token = None
+
         while True:
             try:
                 # Refresh token if needed before each connection attempt
-                self.api_client.get_auth_token()
+                await self.api_client.get_auth_token()
                 if not self.api_client.token:
                     logger.error("Failed to obtain auth token. Waiting 60 seconds before retrying.")
                     await asyncio.sleep(60)
                     continue
                 
                 # Generate timestamp in RFC1123 format as required by VEX TM API
-                date = datetime.now(timezone.utc).strftime("%a, %d %b %Y %H:%M:%S GMT")
-                
-                # The host value for signature MUST match what will be in the Host header
-                # For websockets, if port is specified in URL, it will be in the Host header
-                if parsed_base.port:
-                    host_for_signature = f"{parsed_base.hostname}:{parsed_base.port}"
-                else:
-                    host_for_signature = parsed_base.hostname
+                date = rfc1123_now()
                 
-                logger.debug(f"Creating signature with host: {host_for_signature}")
-                logger.debug(f"URI path: {uri_path}")
-                logger.debug(f"Date: {date}")
-                logger.debug(f"Token (first 20 chars): {self.api_client.token[:20]}...")
+                logger.debug("Creating signature with host: %s", self._host)
+                logger.debug("URI path: %s", self._uri_path)
+                logger.debug("Date: %s", date)
+                logger.debug("Token (first 20 chars): %s...", self.api_client.token[:20])
                 
                 # Create the HMAC signature according to VEX TM API spec
-                signature = self.api_client.create_signature("GET", uri_path, host_for_signature, date)
+                if signer is None or signer_token != self.api_client.token:
+                    signer = self.api_client.prepare_signer("GET", self._uri_path, self._host)
+                    signer_token = self.api_client.token
+                signature = signer(date)
                 
-                logger.debug(f"Generated signature: {signature}")
+                logger.debug("Generated signature: %s", signature)
 
                 # Build headers for websocket connection
                 # Note: websockets library automatically adds Host header, so we don't include it
@@ -89,21 +92,31 @@ class VexTmConnector:
                     "x-tm-signature": signature
                 }
 
-                logger.info(f"Connecting to websocket at {ws_url}")
-                logger.debug(f"Headers being sent: {headers}")
+                logger.info(f"Connecting to websocket at {self._ws_url}")
+                logger.debug("Headers being sent: %s", headers)
 
-                # Connect to websocket with authentication headers
-                async with websockets.connect(ws_url, extra_headers=headers) as websocket:
+                # Connect to websocket with authentication headers. Frames are small JSON
+                # messages, so per-message deflate is not worth its CPU; pings detect a
+                # dead connection within ~30 seconds.
+                async with websockets.connect(
+                    self._ws_url,
+                    extra_headers=headers,
+                    compression=None,
+                    ping_interval=20,
+                    ping_timeout=10,
+                    max_size=2**20,
+                    read_limit=2**18
+                ) as websocket:
                     logger.info("Websocket connection established successfully!")
                     
                     # Listen for messages from the websocket
                     while True:
                         message = await websocket.recv()
-                        logger.debug(f"Raw message received: {message}")
+                        logger.debug("Raw message received: %s", message)
                         
                         try:
-                            data = json.loads(message)
-                            logger.info(f"Parsed message type: {data.get('type')}, field: {data.get('fieldID')}")
+                            data = orjson.loads(message)
+                            logger.info("Parsed message type: %s, field: %s", data.get('type'), data.get('fieldID'))
                             
                             # Create event object and add to queue
                             event = Event(
@@ -111,9 +124,14 @@ class VexTmConnector:
                                 field=data.get("fieldID"),
                                 payload=data
                             )
-                            await self.event_queue.put(event)
-                            logger.info(f"Enqueued event: {event.to_json()}")
+                            # Never wait on a full queue: a stalled reader gets the socket dropped
+                            dropped = put_drop_oldest(self.event_queue, event)
+                            if dropped is not None:
+                                logger.warning("Event queue overflow; dropped oldest event %s (%s).", dropped.id, dropped.type)
+                            if logger.isEnabledFor(logging.INFO):
+                                logger.info("Enqueued event: %s", event.to_json())
                             
+                        # orjson's decode error subclasses json.JSONDecodeError
                         except json.JSONDecodeError as e:
                             logger.warning(f"Could not decode JSON from message: {message}. Error: {e}")
                         except Exception as e:
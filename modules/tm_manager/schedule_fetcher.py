@@ -1,13 +1,16 @@
 import asyncio
-import json
+import hashlib
+import orjson
 import os
 import logging
-import time
 
 from modules.tm_manager.api_client import VexTmApiClient
 
 logger = logging.getLogger(__name__)
 
+# Matches the API client's connection pool size
+MAX_CONCURRENT_FETCHES = 8
+
 class ScheduleFetcher:
     def __init__(self, api_client, storage_path='storage', interval=300):
         self.api_client = api_client
@@ -15,59 +18,93 @@ class ScheduleFetcher:
         self.schedule_file = os.path.join(self.storage_path, 'schedule.json')
         self.interval = interval
         self.running = False
+        # SHA-256 of the last schedule written, so unchanged fetches leave the file alone
+        self._last_hash = None
 
-    def _fetch_and_save_schedule(self):
+    async def _fetch_and_save_schedule(self):
         logger.info("Fetching divisions...")
-        divisions_data = self.api_client.get("/api/divisions")
+        divisions_data = await self.api_client.get("/api/divisions")
         if not divisions_data or "divisions" not in divisions_data:
             logger.error("Could not fetch divisions. Aborting schedule fetch.")
             return
 
-        full_schedule = {"divisions": []}
-
-        for division in divisions_data["divisions"]:
-            div_id = division["id"]
-            logger.info(f"Fetching schedule for division {div_id}...")
-            matches_data = self.api_client.get(f"/api/matches/{div_id}")
-            
-            if matches_data and "matches" in matches_data:
-                division_schedule = {
-                    "id": div_id,
-                    "name": division["name"],
-                    "matches": matches_data["matches"]
-                }
-                full_schedule["divisions"].append(division_schedule)
-            else:
-                logger.warning(f"No matches found for division {div_id}.")
+        divisions = divisions_data["divisions"]
+        logger.info(f"Fetching schedules for {len(divisions)} divisions...")
+        # Bounded so each request is signed just before it is sent, rather than
+        # signing every request up front and queueing them for a free connection
+        semaphore = asyncio.Semaphore(min(MAX_CONCURRENT_FETCHES, len(divisions)) or 1)
+
+        async def fetch_matches(div_id):
+            async with semaphore:
+                return await self.api_client.get(f"/api/matches/{div_id}")
+
+        all_matches = await asyncio.gather(*(fetch_matches(division["id"]) for division in divisions))
+
+        full_schedule = {"divisions": [
+            {"id": division["id"], "name": division["name"], "matches": matches}
+            for division, matches_data in zip(divisions, all_matches)
+            if (matches := (matches_data or {}).get("matches")) is not None
+        ]}
+        if len(full_schedule["divisions"]) < len(divisions):
+            for division, matches_data in zip(divisions, all_matches):
+                if (matches_data or {}).get("matches") is None:
+                    logger.warning(f"No matches found for division {division['id']}.")
         
-        self._atomic_write(self.schedule_file, json.dumps(full_schedule, indent=4))
+        # orjson serializes straight to bytes; the write and fsync run off the event loop
+        payload = orjson.dumps(full_schedule, option=orjson.OPT_INDENT_2)
+        payload_hash = hashlib.sha256(payload).hexdigest()
+        if self._last_hash is not None and not await asyncio.to_thread(os.path.exists, self.schedule_file):
+            # Deleted since the last write (e.g. by a system reset); write it again
+            self._last_hash = None
+        if self._last_hash is None:
+            self._last_hash = await asyncio.to_thread(self._hash_file, self.schedule_file)
+        if payload_hash == self._last_hash:
+            logger.info("Fetched schedule is unchanged; not rewriting it.")
+            return
+
+        if not await asyncio.to_thread(self._atomic_write, self.schedule_file, payload):
+            return
+        self._last_hash = payload_hash
         logger.info("Successfully fetched and saved the full schedule.")
 
+    @staticmethod
+    def _hash_file(file_path):
+        try:
+            with open(file_path, 'rb') as f:
+                return hashlib.sha256(f.read()).hexdigest()
+        except FileNotFoundError:
+            return None
+
     def _atomic_write(self, file_path, data):
         temp_path = file_path + ".tmp"
         try:
-            with open(temp_path, 'w') as f:
+            with open(temp_path, 'wb') as f:
                 f.write(data)
-            os.rename(temp_path, file_path)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(temp_path, file_path)
+            return True
         except Exception as e:
             logger.error(f"Failed to atomically write to {file_path}: {e}")
             if os.path.exists(temp_path):
                 os.remove(temp_path)
+            return False
 
     async def run(self):
         self.running = True
         logger.info(f"Schedule fetcher started. Will fetch every {self.interval} seconds.")
         while self.running:
             try:
-                self._fetch_and_save_schedule()
+                await self._fetch_and_save_schedule()
                 await asyncio.sleep(self.interval)
             except Exception as e:
                 logger.error(f"An error occurred in the schedule fetcher loop: {e}", exc_info=True)
                 # Wait a bit longer after an error to avoid spamming
                 await asyncio.sleep(self.interval * 2)
 
-    def stop(self):
+    async def stop(self):
         self.running = False
+        await self.api_client.close()
 
 if __name__ == '__main__':
     # Example usage for testing
@@ -92,7 +129,7 @@ if __name__ == '__main__':
         fetch_task = asyncio.create_task(fetcher.run())
         
         await asyncio.sleep(35) # Run for a bit
-        fetcher.stop()
+        await fetcher.stop()
         await fetch_task
 
     try:
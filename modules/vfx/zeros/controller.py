@@ -1,14 +1,46 @@
+import asyncio
+from functools import lru_cache
 from pythonosc import udp_client
+from pythonosc.osc_bundle_builder import IMMEDIATELY, OscBundleBuilder
+from pythonosc.osc_message_builder import BuildError, OscMessageBuilder
 import logging
 
 logger = logging.getLogger(__name__)
 
+@lru_cache(maxsize=256)
+def _osc_message(address):
+    """Argument-less OSC message for an address, built once and reused for every send."""
+    return OscMessageBuilder(address=address).build()
+
+def _build_zeros_message(target_type, command, target_id_num):
+    # ZerOS OSC command format used here: /zeros/<target_type>/<command>/<target_id>
+    return OscMessageBuilder(address=f"/zeros/{target_type}/{command}/{target_id_num}").build()
+
+# Messages for the common targets, encoded once at import
+_PREBUILT_IDS = range(1, 65)
+_PREBUILT = {
+    (target_type, command, target_id_num): _build_zeros_message(target_type, command, target_id_num)
+    for target_type in ('playback', 'cue')
+    for command in ('go', 'release')
+    for target_id_num in _PREBUILT_IDS
+}
+
+@lru_cache(maxsize=256)
+def _zeros_message_slow(target_type, command, target_id_num):
+    return _build_zeros_message(target_type, command, target_id_num)
+
+def _zeros_message(target_type, command, target_id_num):
+    message = _PREBUILT.get((target_type, command, target_id_num))
+    if message is None:
+        message = _zeros_message_slow(target_type, command, target_id_num)
+    return message
+
 class ZerOSController:
     def __init__(self, board_ip, port=8830):
-        logger.debug(f"ZerOSController.__init__ called with board_ip={board_ip}, port={port}")
+        logger.debug("ZerOSController.__init__ called with board_ip=%s, port=%s", board_ip, port)
         self.board_ip = board_ip
         self.port = port
-        logger.debug(f"Attempting to initialize ZerOSController for IP {self.board_ip} on port {self.port}")
+        logger.debug("Attempting to initialize ZerOSController for IP %s on port %s", self.board_ip, self.port)
         try:
             self.client = udp_client.SimpleUDPClient(self.board_ip, self.port)
             logger.info(f"Initialized OSC client for ZerOS board at {self.board_ip}:{self.port}")
@@ -16,21 +48,15 @@ class ZerOSController:
             logger.error(f"Failed to initialize OSC client: {e}")
             self.client = None
 
-    def execute_action(self, action):
-        logger.debug(f"ZerOSController.execute_action called with action: {action.to_dict() if hasattr(action, 'to_dict') else action}")
-        if not self.client:
-            logger.error("ZerOS OSC client not initialized. Cannot execute action.")
-            return
-
+    def _message_for(self, action):
+        """Resolves a lighting action to its OSC message, or None if it is invalid."""
         if action.osc_address:
-            address = action.osc_address
-            logger.info(f"Executing custom ZerOS OSC action: Address: {address}")
+            logger.info(f"Executing custom ZerOS OSC action: Address: {action.osc_address}")
             try:
-                self.client.send_message(address, None)
-                logger.info(f"Sent OSC message to {address} with value None")
-            except Exception as e:
-                logger.error(f"An unexpected error occurred during custom ZerOS OSC action: {e}")
-            return
+                return _osc_message(action.osc_address)
+            except BuildError as e:
+                logger.error(f"Invalid OSC address for ZerOS: {action.osc_address}: {e}")
+                return None
 
         if action.command == "release" and action.release_id:
             target_id = action.release_id
@@ -39,30 +65,81 @@ class ZerOSController:
         target_type = action.target_type or 'playback'
         command = action.command or 'go'
 
-        logger.debug(f"Received lighting action: {action}")
-        logger.debug(f"Target ID: {target_id}, Target Type: {target_type}, Command: {command}")
+        logger.debug("Received lighting action: %s", action)
+        logger.debug("Target ID: %s, Target Type: %s, Command: %s", target_id, target_type, command)
         logger.info(f"Executing ZerOS action: Target: {target_type} {target_id}, Command: {command}")
 
         try:
-            # ZerOS OSC command format used here: /zeros/<target_type>/<command>/<target_id>
             # If the target is a cue and no ID was provided, default to cue 1
             if target_type == 'cue' and (target_id is None or str(target_id).strip() == ''):
                 logger.debug("No cue ID provided; defaulting to cue 1")
                 target_id_num = 1
             else:
                 target_id_num = int(target_id)
-
-            address = f"/zeros/{target_type}/{command}/{target_id_num}"
-            
-            logger.debug(f"Constructed OSC address: {address}")
-            self.client.send_message(address, None)
-            logger.info(f"Sent OSC message to {address}")
-
         except (ValueError, TypeError):
             logger.error(f"Invalid target_id for ZerOS: {target_id}. Must be an integer.")
+            return None
+
+        message = _zeros_message(target_type, command, target_id_num)
+        logger.debug("Constructed OSC address: %s", message.address)
+        return message
+
+    def execute_action(self, action):
+        self.execute_actions([action])
+
+    def execute_actions(self, actions):
+        """Sends the given lighting actions in order, as one OSC bundle when there are several."""
+        logger.debug("ZerOSController.execute_actions called with actions: %s", actions)
+        if not self.client:
+            logger.error("ZerOS OSC client not initialized. Cannot execute action.")
+            return
+
+        messages = [message for message in map(self._message_for, actions) if message is not None]
+        if not messages:
+            return
+
+        try:
+            if len(messages) == 1:
+                self.client.send(messages[0])
+            else:
+                bundle = OscBundleBuilder(IMMEDIATELY)
+                for message in messages:
+                    bundle.add_content(message)
+                self.client.send(bundle.build())
+            logger.info(f"Sent OSC message(s) to {', '.join(message.address for message in messages)}")
         except Exception as e:
             logger.error(f"An unexpected error occurred during ZerOS OSC action: {e}")
 
+class ZerOSActionBatcher:
+    """
+    Buffers lighting actions for a short window and sends each window's actions
+    to the board as a single OSC bundle, in the order they were submitted.
+    """
+    def __init__(self, controller, window_s=0.005):
+        self.controller = controller
+        self.window_s = window_s
+        self._queue = asyncio.Queue()
+        self._task = None
+
+    def submit(self, action):
+        self._queue.put_nowait(action)
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    async def _run(self):
+        while True:
+            batch = [await self._queue.get()]
+            await asyncio.sleep(self.window_s)
+            while not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+
+            if len(batch) > 1:
+                logger.info("Bundling %s lighting actions into one OSC packet", len(batch))
+            try:
+                self.controller.execute_actions(batch)
+            except Exception as e:
+                logger.error("Error executing batched lighting actions: %s", e)
+
 if __name__ == '__main__':
     # Example usage for testing
     import os
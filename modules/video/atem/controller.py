@@ -1,12 +1,17 @@
+import asyncio
 import PyATEMMax
 import logging
 
 logger = logging.getLogger(__name__)
 
 class AtemController:
-    def __init__(self, atem_ip):
+    def __init__(self, atem_ip, monitor_interval_s=2.0):
         self.atem_ip = atem_ip
+        self.monitor_interval_s = monitor_interval_s
         self.atem = PyATEMMax.ATEMMax()
+        # Set when a command fails, so the monitor reconnects even if the library
+        # still reports the connection as up
+        self._needs_reconnect = False
         self._connect()
 
     def _connect(self):
@@ -21,15 +26,28 @@ class AtemController:
         except Exception as e:
             logger.error(f"Error connecting to ATEM: {e}")
 
-    def _ensure_connection(self):
-        if not self.atem.connected:
-            logger.warning("ATEM not connected. Attempting to reconnect...")
-            self._connect()
-        return self.atem.connected
+    async def monitor(self):
+        """
+        Keeps the switcher connection up in the background, so actions never wait on
+        a reconnect. The blocking connect runs in a worker thread.
+        """
+        while True:
+            if self._needs_reconnect or not self.atem.connected:
+                logger.warning("ATEM not connected. Attempting to reconnect...")
+                self._needs_reconnect = False
+                await asyncio.to_thread(self._reconnect)
+            await asyncio.sleep(self.monitor_interval_s)
+
+    def _reconnect(self):
+        try:
+            self.atem.disconnect()
+        except Exception as e:
+            logger.debug("Ignoring error while dropping the ATEM connection: %s", e)
+        self._connect()
 
     def execute_action(self, action):
-        if not self._ensure_connection():
-            logger.error("Cannot execute ATEM action, no connection.")
+        if self._needs_reconnect or not self.atem.connected:
+            logger.error("Cannot execute ATEM action, no connection. Dropping it until the switcher reconnects.")
             return
 
         camera_id = action.camera_id
@@ -45,6 +63,7 @@ class AtemController:
             logger.error(f"Invalid camera_id for ATEM: {camera_id}. Must be an integer.")
         except Exception as e:
             logger.error(f"An unexpected error occurred during ATEM action: {e}")
+            self._needs_reconnect = True
 
     def disconnect(self):
         if self.atem.connected:
@@ -1,26 +1,30 @@
 import asyncio
-from flask import Flask, render_template, jsonify, request, redirect, url_for, session, flash, g
+import hashlib
+from quart import Quart, render_template, jsonify, request, redirect, url_for, session, flash, g
 import os
 import json
+import orjson
 import logging
+import logging.handlers
 import tempfile
+import threading
 from functools import wraps
 import uuid
 import queue
-from flask import Response
-import time
-import requests
-import traceback
+import re
+from quart import Response, send_file, make_response
 
 from models.fields import FieldState
 from models.config import Config
 from models.events import Event
+from modules.event_queue import enqueue, put_drop_oldest
+from modules.json_document import JsonDocument
+from modules.popup_store import get_popup_store
 from userManager import UserManager
 
 # This is a placeholder for where the event queue would be shared
 # In a real app, this would be managed more robustly (e.g., via a global context or passed in)
 event_queue = None
-loop = None
 
 # Storage paths used throughout the server. Define these early so functions that
 # run during module import (like logging configuration) can read the config file.
@@ -30,224 +34,357 @@ CONFIG_FILE = os.path.join(STORAGE_PATH, 'config.json')
 SCHEDULED_MATCHES_FILE = os.path.join(STORAGE_PATH, 'scheduled_matches.json')
 POPUPS_FILE = os.path.join(STORAGE_PATH, 'popups.json')
 PRESETS_FILE = os.path.join(STORAGE_PATH, 'presets.json')
+# Resolved once for the storage editor's directory-traversal check. The trailing
+# separator keeps a sibling like 'storage_evil/' from passing the prefix test.
+_STORAGE_ABS = os.path.abspath(STORAGE_PATH) + os.sep
 
 def _read_json(file_path, default=None):
     try:
-        with open(file_path, 'r') as f:
-            return json.load(f)
+        with open(file_path, 'rb') as f:
+            return orjson.loads(f.read())
     except (FileNotFoundError, json.JSONDecodeError):
         return default
 
-def set_event_queue(queue, main_loop):
-    global event_queue, loop
+def set_event_queue(queue):
+    # The app is served on the same event loop as the queue's consumers
+    global event_queue
     event_queue = queue
-    loop = main_loop
-
-# Create a queue to hold log records
-log_queue = queue.Queue()
-
-class QueueLogHandler(logging.Handler):
-    def __init__(self, log_queue):
-        super().__init__()
-        self.log_queue = log_queue
-
-    def emit(self, record):
-        self.log_queue.put(self.format(record))
-
-# Configure logging
-# Keep the existing basicConfig, but also add our queue handler
-queue_handler = QueueLogHandler(log_queue)
-formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
-queue_handler.setFormatter(formatter)
-logging.getLogger().addHandler(queue_handler)
-
-def send_ntfy_notification(title, message, priority="high", tags="rotating_light"):
-    """Helper function to send a notification to the configured ntfy endpoint."""
-    # ntfy notifications have been disabled per user request.
-    # Keep the function as a no-op so callers don't need to be changed.
-    logging.getLogger(__name__).debug("ntfy notifications disabled; skipping send_ntfy_notification.")
-    return
-
-class NtfyLogHandler(logging.Handler):
-    """
-    A logging handler that sends notifications for ERROR and CRITICAL logs
-    to a configured ntfy endpoint.
-    """
-    def __init__(self):
-        super().__init__()
 
+# Raw log records from every thread. Callers only enqueue the record; formatting
+# happens on the listener thread below. Both this queue and each live-logs client's
+# queue are bounded and drop their oldest lines when full, so a stalled listener or
+# a slow client costs lost log lines rather than unbounded memory.
+LOG_QUEUE_MAXSIZE = 10_000
+LOG_SUBSCRIBER_QUEUE_MAXSIZE = 1_000
+log_queue = queue.Queue(maxsize=LOG_QUEUE_MAXSIZE)
+
+# Log records/lines discarded because a queue was full
+_dropped_log_records = 0
+
+class DropOldestQueueHandler(logging.handlers.QueueHandler):
+    """A QueueHandler that never blocks the logging thread: when full, the oldest record goes."""
+    def enqueue(self, record):
+        global _dropped_log_records
+        try:
+            self.queue.put_nowait(record)
+            return
+        except queue.Full:
+            pass
+        try:
+            self.queue.get_nowait()
+            self.queue.task_done()
+        except queue.Empty:
+            pass
+        _dropped_log_records += 1
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            # Another thread refilled it first; losing this record is equivalent
+            _dropped_log_records += 1
+
+def _push_log_line(subscriber, line):
+    """Runs on the subscriber's loop."""
+    global _dropped_log_records
+    if put_drop_oldest(subscriber, line) is not None:
+        _dropped_log_records += 1
+
+# (event loop, asyncio.Queue of formatted lines) per connected live-logs client
+_log_subscribers = set()
+_log_subscribers_lock = threading.Lock()
+
+class SseLogHandler(logging.Handler):
+    """Formats records on the listener thread and broadcasts them to every log stream."""
     def emit(self, record):
-        """
-        Formats and sends the log record as a notification.
-        """
-        # ntfy notifications via logging handler are disabled.
-        # We leave this handler as a no-op to avoid changing places that may instantiate it.
-        logging.getLogger(__name__).debug("NtfyLogHandler.emit called but notifications are disabled.")
-        return
+        line = self.format(record)
+        with _log_subscribers_lock:
+            subscribers = list(_log_subscribers)
+        for subscriber_loop, subscriber in subscribers:
+            try:
+                subscriber_loop.call_soon_threadsafe(_push_log_line, subscriber, line)
+            except RuntimeError:
+                # The client's loop has shut down
+                pass
 
 # Configure logging
 # Keep the existing basicConfig, but also add our queue handler
-queue_handler = QueueLogHandler(log_queue)
-formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
-queue_handler.setFormatter(formatter)
+queue_handler = DropOldestQueueHandler(log_queue)
 logging.getLogger().addHandler(queue_handler)
 
-# Add the ntfy handler to the root logger if configured
-# ntfy log handler is intentionally disabled. If you want to re-enable ntfy
-# notifications, restore the lines above that add NtfyLogHandler when a
-# ntfy_error_endpoint is configured.
+sse_handler = SseLogHandler()
+sse_handler.setFormatter(logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s'))
+log_listener = logging.handlers.QueueListener(log_queue, sse_handler)
+log_listener.start()
 
+# ntfy notifications (for ERROR/CRITICAL logs) are intentionally disabled.
 logging.getLogger().setLevel(logging.INFO) # Ensure root logger captures all levels
 
 logger = logging.getLogger(__name__)
 
-app = Flask(__name__)
+app = Quart(__name__)
 app.secret_key = os.environ.get("FLASK_SECRET_KEY", "a_very_insecure_default_secret_key")
 
 userManager = UserManager()
-
-STORAGE_PATH = 'storage'
-FIELDS_DIR = os.path.join(STORAGE_PATH, 'fields')
-CONFIG_FILE = os.path.join(STORAGE_PATH, 'config.json')
-SCHEDULED_MATCHES_FILE = os.path.join(STORAGE_PATH, 'scheduled_matches.json')
-POPUPS_FILE = os.path.join(STORAGE_PATH, 'popups.json')
-PRESETS_FILE = os.path.join(STORAGE_PATH, 'presets.json')
-
-def _atomic_write(file_path, data):
+popup_store = get_popup_store(POPUPS_FILE)
+# Config and presets are served from memory; edits are written back on a short debounce
+config_doc = JsonDocument(CONFIG_FILE)
+presets_doc = JsonDocument(PRESETS_FILE, default={"lighting": []})
+# Files the storage editor can overwrite that have an in-memory copy to refresh
+_RELOAD_ON_SAVE = {
+    os.path.abspath(POPUPS_FILE): popup_store.reload,
+    os.path.abspath(CONFIG_FILE): config_doc.reload,
+    os.path.abspath(PRESETS_FILE): presets_doc.reload,
+}
+
+async def _read_json_async(file_path, default=None):
+    # Route handlers run on the event loop shared with the event processor, so
+    # file I/O goes to a worker thread
+    return await asyncio.to_thread(_read_json, file_path, default)
+
+def _write_text_atomic(file_path, content):
+    temp_fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(file_path))
+    with os.fdopen(temp_fd, 'w') as temp_f:
+        temp_f.write(content)
+    os.rename(temp_path, file_path)
+
+# Storage files deleted by a system reset
+_RESET_FILES = frozenset({'schedule.json', 'notified_matches.json'})
+
+def _remove_reset_files():
+    """Deletes the reset files present in storage in one directory pass. Returns their names."""
+    removed = []
     try:
-        temp_fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(file_path))
-        with os.fdopen(temp_fd, 'w') as temp_f:
-            json.dump(data, temp_f, indent=4)
-        os.replace(temp_path, file_path)
-        logger.info(f"Successfully wrote to {file_path}")
-    except Exception as e:
-        logger.error(f"Failed to atomically write to {file_path}: {e}")
-        if 'temp_path' in locals() and os.path.exists(temp_path):
-            os.remove(temp_path)
+        with os.scandir(STORAGE_PATH) as it:
+            for entry in it:
+                if entry.name in _RESET_FILES:
+                    try:
+                        os.unlink(entry.path)
+                        removed.append(entry.name)
+                    except FileNotFoundError:
+                        pass
+    except FileNotFoundError:
+        pass
+    return removed
+
+# Owners and admins have universal access
+_PRIVILEGED_ROLES = frozenset({"owner", "admin"})
 
 def login_required(roles=None):
     if roles is None:
         roles = ["ANY"]
     if isinstance(roles, str):
         roles = [roles]
+    # Resolved once per route rather than on every request
+    allowed_roles = frozenset(roles)
+    allow_any = "ANY" in allowed_roles
 
     def wrapper(fn):
         @wraps(fn)
-        def decorated_view(*args, **kwargs):
-            if 'user' not in session:
-                flash("You must be logged in to view this page.", "danger")
+        async def decorated_view(*args, **kwargs):
+            user = session.get('user')
+            if user is None:
+                await flash("You must be logged in to view this page.", "danger")
                 return redirect(url_for('login', next=request.url))
-            
-            user_role = session.get('user', {}).get('role')
 
-            # Owners and admins have universal access
-            if user_role in ['owner', 'admin']:
-                return fn(*args, **kwargs)
+            user_role = user.get('role')
+            if allow_any or user_role in _PRIVILEGED_ROLES or user_role in allowed_roles:
+                return await fn(*args, **kwargs)
+
+            await flash("You do not have permission to view this page.", "danger")
+            return redirect(url_for('index'))
+        return decorated_view
+    return wrapper
+
+# Distinguishes this process's in-memory version counters from a previous run's
+_ETAG_EPOCH = uuid.uuid4().hex[:8]
 
-            # Allow any logged-in user if "ANY" is in roles
-            if "ANY" in roles:
-                return fn(*args, **kwargs)
+def _not_modified(etag):
+    response = Response(status=304)
+    response.set_etag(etag, weak=True)
+    return response
 
-            # Check if the user's role is in the allowed list
-            if user_role not in roles:
-                flash("You do not have permission to view this page.", "danger")
-                return redirect(url_for('index'))
-            
-            return fn(*args, **kwargs)
+def conditional(etag_fn):
+    """
+    Adds a weak ETag to a GET view's response and answers a matching If-None-Match
+    with a 304 without running the view. `etag_fn` must be cheap: it runs on every
+    request. It is called before the view, so a change landing in between is at
+    worst re-sent on the next poll, never served stale.
+    """
+    def wrapper(fn):
+        @wraps(fn)
+        async def decorated_view(*args, **kwargs):
+            if request.method != 'GET':
+                return await fn(*args, **kwargs)
+            etag = etag_fn()
+            if etag is None:
+                return await fn(*args, **kwargs)
+            if request.if_none_match.contains_weak(etag):
+                return _not_modified(etag)
+            response = await make_response(await fn(*args, **kwargs))
+            if response.status_code == 200:
+                response.set_etag(etag, weak=True)
+            return response
         return decorated_view
     return wrapper
 
+def _popups_etag():
+    return f"{_ETAG_EPOCH}-{popup_store.version}"
+
+def _document_etag(doc):
+    def etag_fn():
+        # Pick up an outside edit first so the version reflects what get() will return
+        doc.refresh()
+        return f"{_ETAG_EPOCH}-{doc.version}"
+    return etag_fn
+
+def _file_etag(file_path):
+    def etag_fn():
+        try:
+            st = os.stat(file_path)
+        except FileNotFoundError:
+            return None
+        return f"{st.st_mtime_ns:x}-{st.st_size:x}"
+    return etag_fn
+
+# path -> (st_mtime_ns, st_size, FieldState or None if invalid) for parsed field files
+_field_cache = {}
+_field_cache_lock = threading.Lock()
+# (files key, serialized /api/status body, its ETag) for the last set of field files served
+_status_body_cache = (None, b'[]', None)
+
 def get_field_statuses():
     """
     Scans the fields directory and returns a list of field states.
+    Files are only re-parsed when their mtime or size changes.
+    """
+    return _scan_field_statuses()[1]
+
+def get_field_statuses_json():
     """
+    Returns the field states serialized as a JSON array, and an ETag for it. The
+    bytes are reused until a field file is added, removed, or changes mtime or size.
+    """
+    global _status_body_cache
+    key, statuses = _scan_field_statuses()
+    cached_key, body, etag = _status_body_cache
+    if key != cached_key:
+        body = orjson.dumps([status.to_dict() for status in statuses], option=orjson.OPT_SORT_KEYS)
+        etag = hashlib.blake2b(body, digest_size=8).hexdigest()
+        _status_body_cache = (key, body, etag)
+    return body, etag
+
+def _scan_field_statuses():
+    """Returns (key of every field file's path, mtime and size; the valid field states)."""
     statuses = []
-    if not os.path.exists(FIELDS_DIR):
-        return statuses
+    key = []
+    try:
+        with os.scandir(FIELDS_DIR) as it:
+            entries = [entry for entry in it if entry.name.endswith(".json") and entry.is_file()]
+    except FileNotFoundError:
+        return (), statuses
 
-    for filename in sorted(os.listdir(FIELDS_DIR)):
-        if filename.endswith(".json"):
+    entries.sort(key=lambda entry: entry.name)
+    with _field_cache_lock:
+        for entry in entries:
             try:
-                with open(os.path.join(FIELDS_DIR, filename), 'r') as f:
-                    data = json.load(f)
+                st = entry.stat()
+                key.append((entry.path, st.st_mtime_ns, st.st_size))
+                cached = _field_cache.get(entry.path)
+                if cached is not None and cached[0] == st.st_mtime_ns and cached[1] == st.st_size:
+                    field_state = cached[2]
+                else:
+                    with open(entry.path, 'rb') as f:
+                        data = orjson.loads(f.read())
                     # Basic validation
-                    if 'field_id' in data and 'state' in data:
-                        statuses.append(FieldState.from_dict(data))
+                    field_state = FieldState.from_dict(data) if 'field_id' in data and 'state' in data else None
+                    _field_cache[entry.path] = (st.st_mtime_ns, st.st_size, field_state)
+                if field_state is not None:
+                    statuses.append(field_state)
             except (json.JSONDecodeError, IOError) as e:
-                logger.error(f"Error reading or parsing {filename}: {e}")
-    return statuses
+                logger.error(f"Error reading or parsing {entry.name}: {e}")
+
+        # Forget files that have been removed
+        if len(_field_cache) > len(entries):
+            present = {entry.path for entry in entries}
+            for path in [path for path in _field_cache if path not in present]:
+                del _field_cache[path]
+    return tuple(key), statuses
 
 @app.before_request
-def before_request():
+async def before_request():
     g.user = None
     if 'user' in session:
         g.user = session['user']
 
 @app.route('/')
-def index():
+async def index():
     """
     Serves the main dashboard page.
     """
-    return render_template('index.html')
+    return await render_template('index.html')
 
 @app.route('/api/status')
-def api_status():
+async def api_status():
     """
     API endpoint to get the current status of all fields.
     """
-    field_statuses = get_field_statuses()
-    return jsonify([status.to_dict() for status in field_statuses])
+    body, etag = await asyncio.to_thread(get_field_statuses_json)
+    if request.if_none_match.contains_weak(etag):
+        return _not_modified(etag)
+    response = Response(body, mimetype='application/json')
+    response.set_etag(etag, weak=True)
+    return response
 
 @app.route('/login', methods=['GET', 'POST'])
-def login():
+async def login():
     if request.method == 'POST':
-        username = request.form['username']
-        password = request.form['password']
+        form = await request.form
+        username = form['username']
+        password = form['password']
         logging.debug(f"Login attempt for user: {username}")
-        auth_result = userManager.Auth(username, password)
+        auth_result = await asyncio.to_thread(userManager.Auth, username, password)
         
         if auth_result['user']:
             user_dict = auth_result['user'].__dict__
             session['user'] = user_dict
             logging.debug(f"User '{username}' logged in, session set to: {user_dict}")
-            flash('Logged in successfully.', 'success')
+            await flash('Logged in successfully.', 'success')
             next_page = request.args.get('next')
             return redirect(next_page or url_for('index'))
         else:
             logging.warning(f"Login failed for user '{username}': {auth_result['message']}")
-            flash(auth_result['message'], 'danger')
+            await flash(auth_result['message'], 'danger')
     
-    return render_template('login.html')
+    return await render_template('login.html')
 
 @app.route('/logout')
-def logout():
+async def logout():
     session.pop('user', None)
-    flash('You have been logged out.', 'info')
+    await flash('You have been logged out.', 'info')
     return redirect(url_for('index'))
 
 @app.route('/config_editor')
 @login_required(roles=["admin"])
-def config_editor_page():
+async def config_editor_page():
     """
     Serves the configuration editor page.
     """
-    return render_template('config_editor.html')
+    return await render_template('config_editor.html')
 
 @app.route('/api/storage_files')
 @login_required(roles=["admin"])
-def list_storage_files():
+async def list_storage_files():
     """
     API endpoint to list all .json files in the storage directory.
     """
     try:
-        files = [f for f in os.listdir(STORAGE_PATH) if f.endswith('.json')]
+        files = [f for f in await asyncio.to_thread(os.listdir, STORAGE_PATH) if f.endswith('.json')]
         return jsonify(files)
     except FileNotFoundError:
         return jsonify([])
 
 @app.route('/api/storage_file_content')
 @login_required(roles=["admin"])
-def get_storage_file_content():
+async def get_storage_file_content():
     """
     API endpoint to get the content of a specific file in the storage directory.
     """
@@ -257,13 +394,13 @@ def get_storage_file_content():
 
     # Security check: ensure the file is directly within the STORAGE_PATH
     file_path = os.path.join(STORAGE_PATH, os.path.basename(file_name))
-    if not os.path.abspath(file_path).startswith(os.path.abspath(STORAGE_PATH)):
+    if not os.path.abspath(file_path).startswith(_STORAGE_ABS):
         return "Directory traversal attempt detected", 403
 
     try:
-        with open(file_path, 'r') as f:
-            # We return as plain text to preserve formatting in the textarea
-            return f.read()
+        # We return as plain text to preserve formatting in the textarea. The body is
+        # streamed from the file, and unchanged files get a 304 via ETag/Last-Modified.
+        return await send_file(file_path, mimetype='text/plain', conditional=True)
     except FileNotFoundError:
         return "File not found", 404
     except Exception as e:
@@ -272,11 +409,11 @@ def get_storage_file_content():
 
 @app.route('/api/save_storage_file', methods=['POST'])
 @login_required(roles=["admin"])
-def save_storage_file():
+async def save_storage_file():
     """
     API endpoint to save content to a specific file in the storage directory.
     """
-    data = request.get_json()
+    data = await request.get_json()
     file_name = data.get('file')
     content = data.get('content')
 
@@ -285,19 +422,18 @@ def save_storage_file():
 
     # Security check
     file_path = os.path.join(STORAGE_PATH, os.path.basename(file_name))
-    if not os.path.abspath(file_path).startswith(os.path.abspath(STORAGE_PATH)):
+    abs_path = os.path.abspath(file_path)
+    if not abs_path.startswith(_STORAGE_ABS):
         return jsonify({"error": "Directory traversal attempt detected"}), 403
 
     try:
         # Validate that the content is valid JSON before writing
-        json.loads(content)
-        # Use _atomic_write with the raw string content
-        # We need to modify _atomic_write to handle string data or do it here
-        temp_fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(file_path))
-        with os.fdopen(temp_fd, 'w') as temp_f:
-            temp_f.write(content)
-        os.rename(temp_path, file_path)
+        orjson.loads(content)
+        await asyncio.to_thread(_write_text_atomic, file_path, content)
         logger.info(f"Successfully wrote to {file_path}")
+        reload = _RELOAD_ON_SAVE.get(abs_path)
+        if reload is not None:
+            await asyncio.to_thread(reload)
         
         return jsonify({"status": "ok"})
     except json.JSONDecodeError:
@@ -309,48 +445,48 @@ def save_storage_file():
 
 @app.route('/pause', methods=['GET', 'POST'])
 @login_required(roles=["admin"])
-def pause_controls():
+async def pause_controls():
     """
     Page for pausing/resuming action categories.
     """
-    config_data = _read_json(CONFIG_FILE, default={})
-    config = Config.from_dict(config_data)
-
     if request.method == 'POST':
         # Update paused state from form data
-        config.paused['audio'] = 'audio' in request.form
-        config.paused['video'] = 'video' in request.form
-        config.paused['lighting'] = 'lighting' in request.form
-        
-        _atomic_write(CONFIG_FILE, config.to_dict())
+        form = await request.form
+        with config_doc.batch() as config_data:
+            config_data['paused'] = {
+                'audio': 'audio' in form,
+                'video': 'video' in form,
+                'lighting': 'lighting' in form,
+            }
         return redirect(url_for('pause_controls'))
 
-    return render_template('pause.html', paused=config.paused)
+    config = Config.from_dict(config_doc.get())
+    return await render_template('pause.html', paused=config.paused)
 
 @app.route('/admin/users')
 @login_required(roles=["admin"])
-def manage_users_page():
+async def manage_users_page():
     """
     Serves the user management page.
     """
-    return render_template('manage_users.html')
+    return await render_template('manage_users.html')
 
 @app.route('/api/users', methods=['GET'])
 @login_required(roles=["admin"])
-def get_users():
+async def get_users():
     """
     API endpoint to get all users.
     """
-    users = userManager.list_users()
+    users = await asyncio.to_thread(userManager.list_users)
     return jsonify([user.__dict__ for user in users])
 
 @app.route('/api/users/<username>', methods=['GET'])
 @login_required(roles=["admin"])
-def get_user(username):
+async def get_user(username):
     """
     API endpoint to get a single user's details.
     """
-    user_data = userManager.getDetails(username)
+    user_data = await asyncio.to_thread(userManager.getDetails, username)
     if user_data:
         role = user_data[2]
         email = user_data[3] if len(user_data) > 3 else None
@@ -359,11 +495,11 @@ def get_user(username):
 
 @app.route('/api/users/add', methods=['POST'])
 @login_required(roles=["admin"])
-def add_user_api():
+async def add_user_api():
     """
     API endpoint to add a new user.
     """
-    data = request.get_json()
+    data = await request.get_json()
     username = data.get('username')
     password = data.get('password')
     role = data.get('role')
@@ -376,7 +512,7 @@ def add_user_api():
         return jsonify({"error": "The 'owner' role cannot be assigned via the API."}), 403
 
     try:
-        userManager.Signup(username, password, role, email)
+        await asyncio.to_thread(userManager.Signup, username, password, role, email)
         return jsonify({"status": "ok"})
     except FileExistsError:
         return jsonify({"error": "User already exists."}), 409
@@ -386,11 +522,11 @@ def add_user_api():
 
 @app.route('/api/users/update/<username>', methods=['POST'])
 @login_required(roles=["admin"])
-def update_user_api(username):
+async def update_user_api(username):
     """
     API endpoint to update a user.
     """
-    data = request.get_json()
+    data = await request.get_json()
     role = data.get('role')
     email = data.get('email')
     new_password = data.get('new_password')
@@ -400,11 +536,11 @@ def update_user_api(username):
 
     try:
         # Update role and email
-        userManager.update_user(username, role, email)
+        await asyncio.to_thread(userManager.update_user, username, role, email)
 
         # If a new password is provided, change it
         if new_password:
-            userManager.changePassword(username, new_password)
+            await asyncio.to_thread(userManager.changePassword, username, new_password)
             
         return jsonify({"status": "ok"})
     except FileNotFoundError:
@@ -417,7 +553,7 @@ def update_user_api(username):
 
 @app.route('/api/users/delete/<username>', methods=['POST'])
 @login_required(roles=["admin"])
-def delete_user_api(username):
+async def delete_user_api(username):
     """
     API endpoint to delete a user.
     """
@@ -426,7 +562,7 @@ def delete_user_api(username):
         return jsonify({"error": "You cannot delete your own account."}), 403
 
     try:
-        if userManager.delete_user(username):
+        if await asyncio.to_thread(userManager.delete_user, username):
             return jsonify({"status": "ok"})
         else:
             return jsonify({"error": "User not found."}), 404
@@ -438,101 +574,97 @@ def delete_user_api(username):
 
 @app.route('/admin/rooms', methods=['GET'])
 @login_required(roles=["admin"])
-def room_management():
+async def room_management():
     """
     Admin page for managing rooms.
     """
-    config_data = _read_json(CONFIG_FILE, default={})
-    rooms = config_data.get("rooms", {})
-    return render_template('room_management.html', rooms=rooms)
+    rooms = config_doc.get().get("rooms", {})
+    return await render_template('room_management.html', rooms=rooms)
 
 @app.route('/admin/rooms/add', methods=['POST'])
 @login_required(roles=["admin"])
-def add_room():
+async def add_room():
     """
     Adds a new room to the configuration.
     """
-    config_data = _read_json(CONFIG_FILE, default={})
-    if "rooms" not in config_data:
-        config_data["rooms"] = {}
-
-    room_id = request.form['room_id']
-    if room_id in config_data["rooms"]:
+    form = await request.form
+    room_id = form['room_id']
+    if room_id in config_doc.get().get("rooms", {}):
         # Handle error, room already exists
         return "Room ID already exists", 400
 
-    teams = [team.strip() for team in request.form.get('teams', '').split(',') if team.strip()]
-    config_data["rooms"][room_id] = {
-        "youtube_stream_url": request.form['youtube_stream_url'],
-        "teams": teams
-    }
-    
-    _atomic_write(CONFIG_FILE, config_data)
+    teams = [team.strip() for team in form.get('teams', '').split(',') if team.strip()]
+    with config_doc.batch() as config_data:
+        config_data.setdefault("rooms", {})[room_id] = {
+            "youtube_stream_url": form['youtube_stream_url'],
+            "teams": teams
+        }
     return redirect(url_for('room_management'))
 
 @app.route('/admin/rooms/edit/<room_id>', methods=['GET', 'POST'])
 @login_required(roles=["admin"])
-def edit_room(room_id):
+async def edit_room(room_id):
     """
     Edits an existing room.
     """
-    config_data = _read_json(CONFIG_FILE, default={})
-    room = config_data.get("rooms", {}).get(room_id)
+    room = config_doc.get().get("rooms", {}).get(room_id)
     if not room:
         return "Room not found", 404
 
     if request.method == 'POST':
-        teams = [team.strip() for team in request.form.get('teams', '').split(',') if team.strip()]
-        config_data["rooms"][room_id]['youtube_stream_url'] = request.form['youtube_stream_url']
-        config_data["rooms"][room_id]['teams'] = teams
-        _atomic_write(CONFIG_FILE, config_data)
+        form = await request.form
+        teams = [team.strip() for team in form.get('teams', '').split(',') if team.strip()]
+        with config_doc.batch() as config_data:
+            room = config_data["rooms"][room_id]
+            room['youtube_stream_url'] = form['youtube_stream_url']
+            room['teams'] = teams
         return redirect(url_for('room_management'))
 
-    return render_template('edit_room.html', room_id=room_id, room=room)
+    return await render_template('edit_room.html', room_id=room_id, room=room)
 
 @app.route('/admin/rooms/delete/<room_id>', methods=['POST'])
 @login_required(roles=["admin"])
-def delete_room(room_id):
+async def delete_room(room_id):
     """
     Deletes a room.
     """
-    config_data = _read_json(CONFIG_FILE, default={})
-    if "rooms" in config_data and room_id in config_data["rooms"]:
-        del config_data["rooms"][room_id]
-        _atomic_write(CONFIG_FILE, config_data)
+    if room_id in config_doc.get().get("rooms", {}):
+        with config_doc.batch() as config_data:
+            del config_data["rooms"][room_id]
     
     return redirect(url_for('room_management'))
 
 @app.route('/controls')
 @login_required(roles=["admin", "av"])
-def controls_page():
+async def controls_page():
     """
     Page for manual controls.
     """
-    return render_template('controls.html')
+    return await render_template('controls.html')
 
 @app.route('/room/<room_id>')
-def room_page(room_id):
+async def room_page(room_id):
     """
     Public page for a specific room.
     """
-    config_data = _read_json(CONFIG_FILE, default={})
-    room_info = config_data.get("rooms", {}).get(room_id)
+    room_info = config_doc.get().get("rooms", {}).get(room_id)
     if not room_info:
         return "Room not found", 404
-    return render_template('room.html', room_id=room_id, room_info=room_info)
+    return await render_template('room.html', room_id=room_id, room_info=room_info)
 
 @app.route('/api/scheduled_matches')
-def api_scheduled_matches():
-    return jsonify(_read_json(SCHEDULED_MATCHES_FILE, default={}))
+@conditional(_file_etag(SCHEDULED_MATCHES_FILE))
+async def api_scheduled_matches():
+    return jsonify(await _read_json_async(SCHEDULED_MATCHES_FILE, default={}))
 
 @app.route('/api/popups')
-def api_popups():
-    return jsonify(_read_json(POPUPS_FILE, default=[]))
+@conditional(_popups_etag)
+async def api_popups():
+    return jsonify(popup_store.list())
 
 @app.route('/api/popups/dismiss', methods=['POST'])
-def dismiss_popup():
-    data = request.get_json()
+async def dismiss_popup():
+    data = await request.get_json()
     logger.debug(f"Received dismiss request: {data}")
 
     popup_id = data.get('popup_id')
@@ -542,77 +674,81 @@ def dismiss_popup():
 
     logger.debug(f"Attempting to dismiss popup_id: {popup_id}")
 
-    popups = _read_json(POPUPS_FILE, default=[])
-    logger.debug(f"Popups before dismissal: {popups}")
-    
-    # Filter out the popup with the given ID
-    new_popups = [p for p in popups if p.get('id') != popup_id]
-
-    if len(new_popups) < len(popups):
-        logger.debug(f"Found and removed popup_id: {popup_id}. Writing new popups: {new_popups}")
-        _atomic_write(POPUPS_FILE, new_popups)
+    if await asyncio.to_thread(popup_store.remove, popup_id):
+        logger.debug(f"Found and removed popup_id: {popup_id}")
         return jsonify({"status": "ok"}), 200
     else:
         logger.warning(f"popup_id not found: {popup_id}")
         return jsonify({"error": "popup_id not found"}), 404
 
+@app.route('/api/popups/dismiss_batch', methods=['POST'])
+async def dismiss_popups_batch():
+    """
+    Dismisses several popups with a single write. Returns whether each id was found.
+    """
+    data = await request.get_json()
+    popup_ids = data.get('popup_ids') if isinstance(data, dict) else None
+    if not isinstance(popup_ids, list) or not popup_ids or not all(isinstance(popup_id, str) for popup_id in popup_ids):
+        return jsonify({"error": "popup_ids must be a non-empty list of strings"}), 400
+
+    removed = await asyncio.to_thread(popup_store.remove_many, popup_ids)
+    logger.debug(f"Dismissed {len(removed)} of {len(popup_ids)} popups in batch")
+    return jsonify({"status": "ok", "results": {popup_id: popup_id in removed for popup_id in popup_ids}}), 200
+
 
 @app.route('/api/config')
-def api_config():
+@conditional(_document_etag(config_doc))
+async def api_config():
     """
     API endpoint to get the current config.
     """
-    config_data = _read_json(CONFIG_FILE, default={})
-    return jsonify(config_data)
+    return jsonify(config_doc.get())
 
 
 @app.route('/api/presets', methods=['GET', 'POST'])
 @login_required(roles=["admin", "av"])
-def presets_api():
+@conditional(_document_etag(presets_doc))
+async def presets_api():
     """
     API for managing presets.
     """
     if request.method == 'POST':
         try:
-            new_presets_data = request.get_json()
-            _atomic_write(PRESETS_FILE, new_presets_data)
+            new_presets_data = await request.get_json()
+            presets_doc.replace(new_presets_data)
             return jsonify({"status": "ok"}), 200
         except Exception as e:
             logger.error(f"Error saving presets: {e}")
             return "Error saving presets", 500
 
-    presets_data = _read_json(PRESETS_FILE, default={"lighting": []})
-    return jsonify(presets_data)
+    return jsonify(presets_doc.get())
 
 
 @app.route('/api/active_popups')
-def api_active_popups():
+@conditional(_popups_etag)
+async def api_active_popups():
     """
     API endpoint to get the list of active popups.
     """
-    return jsonify(_read_json(POPUPS_FILE, default=[]))
+    return jsonify(popup_store.list())
 
 @app.route('/api/remove_popup/<popup_id>', methods=['POST'])
-def remove_popup(popup_id):
+async def remove_popup(popup_id):
     """
     Removes a popup from the active list.
     """
-    popups = _read_json(POPUPS_FILE, default=[])
-    new_popups = [p for p in popups if p.get('id') != popup_id]
-    
-    if len(new_popups) < len(popups):
-        _atomic_write(POPUPS_FILE, new_popups)
+    if await asyncio.to_thread(popup_store.remove, popup_id):
         return jsonify({"status": "ok"}), 200
     else:
         return jsonify({"error": "popup_id not found"}), 404
 
 @app.route('/api/send_popup', methods=['POST'])
 @login_required(roles=["admin"])
-def api_send_popup():
-    if not event_queue or not loop:
+async def api_send_popup():
+    if not event_queue:
         return jsonify({"error": "Event queue not available"}), 500
     
-    data = request.json
+    data = await request.get_json()
     room_ids = data.get("room_ids", [])
     if not room_ids:
         return jsonify({"error": "room_ids is required"}), 400
@@ -626,17 +762,17 @@ def api_send_popup():
         "type": data.get("type", "modal")
     }
     popup_event = Event(type="manual_popup", payload=popup_payload)
-    asyncio.run_coroutine_threadsafe(event_queue.put(popup_event), loop)
+    await enqueue(event_queue, popup_event)
 
     return jsonify({"status": "ok"})
 
 @app.route('/api/trigger_action', methods=['POST'])
 @login_required(roles=["admin", "av"])
-def api_trigger_action():
-    if not event_queue or not loop:
+async def api_trigger_action():
+    if not event_queue:
         return jsonify({"error": "Event queue not available"}), 500
         
-    data = request.json
+    data = await request.get_json()
     action_type = data.get("type")
 
     # AV role restriction
@@ -646,35 +782,22 @@ def api_trigger_action():
             return jsonify({"error": "You are not authorized to trigger this type of action."}), 403
 
     action_event = Event(type="manual_action", payload=data)
-    
-    # Use run_coroutine_threadsafe to safely put an item into the asyncio queue
-    # from this synchronous Flask thread.
-    asyncio.run_coroutine_threadsafe(event_queue.put(action_event), loop)
+    await enqueue(event_queue, action_event)
     return jsonify({"status": "ok"})
 
 @app.route('/api/system/reset', methods=['POST'])
 @login_required(roles=["admin"])
-def reset_system():
+async def reset_system():
     """
     Resets the system by clearing schedule, notified matches, and popups.
     """
-    schedule_file = os.path.join(STORAGE_PATH, 'schedule.json')
-    notified_matches_file = os.path.join(STORAGE_PATH, 'notified_matches.json')
-    popups_file = os.path.join(STORAGE_PATH, 'popups.json')
-
     try:
-        # Delete schedule.json if it exists
-        if os.path.exists(schedule_file):
-            os.remove(schedule_file)
-            logger.info("Deleted schedule.json")
-
-        # Delete notified_matches.json if it exists
-        if os.path.exists(notified_matches_file):
-            os.remove(notified_matches_file)
-            logger.info("Deleted notified_matches.json")
-
-        # Clear popups.json by writing an empty list
-        _atomic_write(popups_file, [])
+        # Delete schedule.json and notified_matches.json if they exist
+        for file_name in await asyncio.to_thread(_remove_reset_files):
+            logger.info(f"Deleted {file_name}")
+
+        # Clear the active popups (and rewrite popups.json as an empty list)
+        await asyncio.to_thread(popup_store.clear)
         logger.info("Cleared popups.json")
 
         return jsonify({"status": "ok", "message": "System reset successfully."})
@@ -684,25 +807,34 @@ def reset_system():
         return jsonify({"status": "error", "message": str(e)}), 500
 
 
+_DIGITS_RE = re.compile(r'\d+')
+
+def _match_number(match_name):
+    """Extracts the match number from a name like 'Q12'."""
+    digits = _DIGITS_RE.search(match_name)
+    if digits is None:
+        raise ValueError(f"No match number in {match_name!r}")
+    return int(digits.group())
+
 @app.route('/simulator')
 @login_required(roles=["admin"])
-def event_simulator_page():
+async def event_simulator_page():
     """
     Serves the event simulator page.
     """
-    return render_template('event_simulator.html')
+    return await render_template('event_simulator.html')
 
 @app.route('/api/simulate_event_from_web', methods=['POST'])
 @login_required(roles=["admin"])
-def api_simulate_event_from_web():
+async def api_simulate_event_from_web():
     """
     Endpoint to receive simulation requests from the web UI.
     This is kept separate from the main `simulate_event` to allow for different auth/validation.
     """
-    if not event_queue or not loop:
+    if not event_queue:
         return jsonify({"error": "Event queue not available"}), 500
         
-    data = request.json
+    data = await request.get_json()
     event_type = data.get('event_type')
     field = data.get('field')
     match_name = data.get('match')
@@ -723,13 +855,13 @@ def api_simulate_event_from_web():
                     "division": 1,
                     "session": 0,
                     "round": round_val or "QUAL",
-                    "match": int(''.join(filter(str.isdigit, match_name))),
+                    "match": _match_number(match_name),
                     "instance": 1
                 }
             }
         }
         assign_event = Event.from_dict(assign_payload)
-        asyncio.run_coroutine_threadsafe(event_queue.put(assign_event), loop)
+        await enqueue(event_queue, assign_event)
 
     # Construct the payload for the main event
     main_payload = {
@@ -746,7 +878,7 @@ def api_simulate_event_from_web():
             "division": 1,
             "session": 0,
             "round": round_val or "QUAL",
-            "match": int(''.join(filter(str.isdigit, match_name))),
+            "match": _match_number(match_name),
             "instance": 1
         }
     elif event_type == "audienceDisplayChanged" and display:
@@ -755,86 +887,98 @@ def api_simulate_event_from_web():
         main_payload["payload"]["match"] = match_name
 
     main_event = Event.from_dict(main_payload)
-    asyncio.run_coroutine_threadsafe(event_queue.put(main_event), loop)
+    await enqueue(event_queue, main_event)
     
     logger.info(f"Successfully queued simulated event from web: {main_event.to_json()}")
     return jsonify({"status": "ok", "event_sent": main_event.to_dict()})
 
 @app.route('/profile', methods=['GET', 'POST'])
 @login_required()
-def profile():
+async def profile():
     if request.method == 'POST':
-        current_password = request.form['current_password']
-        new_password = request.form['new_password']
-        confirm_password = request.form['confirm_password']
+        form = await request.form
+        current_password = form['current_password']
+        new_password = form['new_password']
+        confirm_password = form['confirm_password']
         
         if new_password != confirm_password:
-            flash('New passwords do not match.', 'danger')
+            await flash('New passwords do not match.', 'danger')
             return redirect(url_for('profile'))
 
         username = session['user']['userName']
         
         # Verify current password
-        auth_result = userManager.Auth(username, current_password)
+        auth_result = await asyncio.to_thread(userManager.Auth, username, current_password)
         if not auth_result['user']:
-            flash('Incorrect current password.', 'danger')
+            await flash('Incorrect current password.', 'danger')
             return redirect(url_for('profile'))
 
         # Change password
         try:
-            userManager.changePassword(username, new_password)
-            flash('Password updated successfully.', 'success')
+            await asyncio.to_thread(userManager.changePassword, username, new_password)
+            await flash('Password updated successfully.', 'success')
             return redirect(url_for('profile'))
         except Exception as e:
-            flash(f'An error occurred: {e}', 'danger')
+            await flash(f'An error occurred: {e}', 'danger')
 
     email = session['user'].get('email')
-    return render_template('profile.html', email=email)
+    return await render_template('profile.html', email=email)
 
 @app.route('/profile/email', methods=['POST'])
 @login_required()
-def profile_email():
-    new_email = request.form['new_email']
+async def profile_email():
+    form = await request.form
+    new_email = form['new_email']
     username = session['user']['userName']
     try:
-        userManager.changeEmail(username, new_email)
+        await asyncio.to_thread(userManager.changeEmail, username, new_email)
         # Update email in session
         user_data = session['user']
         user_data['email'] = new_email
         session['user'] = user_data
-        flash('Email updated successfully.', 'success')
+        await flash('Email updated successfully.', 'success')
     except Exception as e:
-        flash(f'An error occurred: {e}', 'danger')
+        await flash(f'An error occurred: {e}', 'danger')
     return redirect(url_for('profile'))
 
 @app.route('/logs')
 @login_required(roles=["admin", "owner"])
-def logs_page():
+async def logs_page():
     """
     Serves the live logs page.
     """
-    return render_template('logs.html')
+    return await render_template('logs.html')
 
 @app.route('/stream-logs')
 @login_required(roles=["admin", "owner"])
-def stream_logs():
-    def generate():
-        while True:
-            try:
-                log_record = log_queue.get(timeout=10)
-                yield f"data: {log_record}\n\n"
-            except queue.Empty:
-                # Send a comment to keep the connection alive
-                yield ": keep-alive\n\n"
-            time.sleep(0.1) # Prevent tight loop
-    return Response(generate(), mimetype='text/event-stream')
+async def stream_logs():
+    async def generate():
+        subscriber = (asyncio.get_running_loop(), asyncio.Queue(maxsize=LOG_SUBSCRIBER_QUEUE_MAXSIZE))
+        with _log_subscribers_lock:
+            _log_subscribers.add(subscriber)
+        try:
+            while True:
+                try:
+                    log_record = await asyncio.wait_for(subscriber[1].get(), timeout=10)
+                    yield f"data: {log_record}\n\n"
+                except asyncio.TimeoutError:
+                    # Send a comment to keep the connection alive
+                    yield ": keep-alive\n\n"
+        finally:
+            # Runs when the client disconnects and the response is closed
+            with _log_subscribers_lock:
+                _log_subscribers.discard(subscriber)
+    response = Response(generate(), mimetype='text/event-stream')
+    # The stream is open-ended; don't let the default response timeout cut it off
+    response.timeout = None
+    return response
 
 @app.errorhandler(404)
-def not_found_error(error):
-    return render_template('error.html', error_code=404, error_message="The page you're looking for can't be found."), 404
+async def not_found_error(error):
+    return await render_template('error.html', error_code=404, error_message="The page you're looking for can't be found."), 404
 
 @app.errorhandler(Exception)
-def internal_error(error):
+async def internal_error(error):
     # Log the error for debugging
     logger.error(f"An unhandled exception occurred: {error}", exc_info=True)
 
@@ -848,11 +992,11 @@ def internal_error(error):
     if not (isinstance(error_code, int) and 500 <= error_code < 600):
         error_code = 500
 
-    return render_template('error.html', error_code=error_code, error_message="An unexpected error occurred. The team has been notified."), error_code
+    return await render_template('error.html', error_code=error_code, error_message="An unexpected error occurred. The team has been notified."), error_code
 
 
 if __name__ == "__main__":
-    # The app should be run with a production-ready WSGI server like Gunicorn
+    # The app should be run with a production-ready ASGI server like Hypercorn
     # For development, we can use app.run, but let's make it listen on all interfaces
     # to be accessible from outside the container.
     app.run(host='0.0.0.0', port=5000, debug=True)
@@ -13,12 +13,10 @@ import getpass
 import sys
 import os
 
-try:
-    from werkzeug.security import generate_password_hash
-except Exception as e:
-    raise ImportError('Werkzeug is required for add_user. Install it with: pip install Werkzeug') from e
-
+# Add the parent directory to sys.path to allow importing userManager
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
+from userManager import password_hash_method
 
 
 def add_user(username, password, role, email=None):
@@ -27,8 +25,14 @@ def add_user(username, password, role, email=None):
         print(f"Error: user '{username}' already exists", file=sys.stderr)
         return 2
 
+    # Imported here so --help and input errors don't wait on Werkzeug
+    try:
+        from werkzeug.security import generate_password_hash
+    except Exception as e:
+        raise ImportError('Werkzeug is required for add_user. Install it with: pip install Werkzeug') from e
+
     os.makedirs(userdir, exist_ok=True)
-    hashed = generate_password_hash(password)
+    hashed = generate_password_hash(password, method=password_hash_method())
     # Only write canonical fields: username, hashed_password, role
     fields = [username, hashed, role]
     if email:
@@ -1,3 +1,5 @@
+import asyncio
+import functools
 import sys
 import os
 import json
@@ -6,13 +8,19 @@ import logging
 # Add the parent directory to sys.path to allow importing modules
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from modules.tm_manager.api_client import VexTmApiClient
-
-# Configure logging
-logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
 def load_config(config_path='storage/config.json'):
+    """Returns the parsed config, re-reading the file only when its mtime changes."""
+    try:
+        mtime_ns = os.stat(config_path).st_mtime_ns
+    except FileNotFoundError:
+        logger.error(f"Config file not found at {config_path}")
+        return None
+    return _parse_config(config_path, mtime_ns)
+
+@functools.lru_cache(maxsize=8)
+def _parse_config(config_path, mtime_ns):
     try:
         with open(config_path, 'r') as f:
             return json.load(f)
@@ -23,7 +31,7 @@ def load_config(config_path='storage/config.json'):
         logger.error(f"Invalid JSON in config file at {config_path}")
         return None
 
-def main():
+async def main():
     config = load_config()
     if not config:
         return
@@ -38,12 +46,21 @@ def main():
         logger.error("Missing VEX TM API configuration. Please check storage/config.json")
         return
 
+    # Imported once the config is known to be usable; it brings in aiohttp
+    from modules.tm_manager.api_client import VexTmApiClient
+
     logger.info(f"Connecting to VEX TM at {base_url}...")
     
     client = VexTmApiClient(client_id, client_secret, api_key, base_url)
     
     # Force token fetch to verify credentials
-    token = client.get_auth_token()
+    try:
+        await list_field_sets(client)
+    finally:
+        await client.close()
+
+async def list_field_sets(client):
+    token = await client.get_auth_token()
     if not token:
         logger.error("Failed to authenticate with VEX TM.")
         return
@@ -51,7 +68,7 @@ def main():
     logger.info("Authentication successful.")
     
     logger.info("Fetching field sets...")
-    response = client.get("/api/fieldsets")
+    response = await client.get("/api/fieldsets")
     
     if response and "fieldsets" in response:
         fieldsets = response["fieldsets"]
@@ -66,4 +83,6 @@ def main():
         logger.error("Failed to fetch field sets or no field sets found.")
 
 if __name__ == "__main__":
-    main()
+    # Configure logging only when run as a script, not on import
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    asyncio.run(main())
@@ -1,6 +1,3 @@
-
-import spotipy
-from spotipy.oauth2 import SpotifyOAuth
 import json
 import os
 
@@ -31,6 +28,10 @@ def get_spotify_devices():
         print(f"Error: Could not decode JSON from {config_path}")
         return
 
+    # Only loaded once the config is usable; spotipy pulls in requests and urllib3
+    import spotipy
+    from spotipy.oauth2 import SpotifyOAuth
+
     try:
         auth_manager = SpotifyOAuth(
             client_id=client_id,
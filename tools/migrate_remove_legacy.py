@@ -22,31 +22,39 @@ if __name__ == '__main__':
     os.makedirs(backup_dir, exist_ok=True)
 
     modified = []
-    for user in os.listdir(ROOT):
-        userdir = os.path.join(ROOT, user)
-        if not os.path.isdir(userdir):
-            continue
-        me_path = os.path.join(userdir, 'Me.txt')
-        if not os.path.isfile(me_path):
-            continue
-
-        # Backup original
-        relpath = os.path.join(user, 'Me.txt')
-        bak_dest = os.path.join(backup_dir, relpath)
-        os.makedirs(os.path.dirname(bak_dest), exist_ok=True)
-        shutil.copy2(me_path, bak_dest)
-
-        # Read and rewrite only the first three fields
-        with open(me_path, 'r') as f:
-            data = f.read().strip()
-        fields = data.split(',') if data else []
-        if len(fields) >= 3:
-            new_fields = fields[:3]
-            with open(me_path, 'w') as f:
-                f.write(','.join(new_fields))
-            modified.append(me_path)
-        else:
-            print(f'Skipping {me_path}: not enough fields')
+    with os.scandir(ROOT) as it:
+        for entry in it:
+            if not entry.is_dir():
+                continue
+            me_path = os.path.join(entry.path, 'Me.txt')
+            try:
+                with open(me_path, 'r') as f:
+                    data = f.read().strip()
+            except FileNotFoundError:
+                continue
+
+            # Backup original. A hard link costs no copy; the rewrite below replaces
+            # Me.txt with a new file, so the link keeps the original contents.
+            bak_dest = os.path.join(backup_dir, entry.name, 'Me.txt')
+            os.makedirs(os.path.dirname(bak_dest), exist_ok=True)
+            try:
+                os.link(me_path, bak_dest)
+            except OSError:
+                # Cross-device or no hard link support
+                shutil.copy2(me_path, bak_dest)
+
+            # Rewrite only the first three fields
+            fields = data.split(',') if data else []
+            if len(fields) >= 3:
+                new_data = ','.join(fields[:3])
+                if new_data != data:
+                    tmp_path = me_path + '.tmp'
+                    with open(tmp_path, 'w') as f:
+                        f.write(new_data)
+                    os.replace(tmp_path, me_path)
+                    modified.append(me_path)
+            else:
+                print(f'Skipping {me_path}: not enough fields')
 
     print(f'Backup of originals created at: {backup_dir}')
     if modified:
@@ -1,19 +1,37 @@
-import requests
 import argparse
 import json
 
+# One pooled session per run: matchStarted sends two requests back to back
+_SESSION = None
+
+def _session():
+    global _SESSION
+    if _SESSION is None:
+        # Imported here so --help and argument errors exit without loading requests
+        import requests
+        _SESSION = requests.Session()
+    return _SESSION
+
 def send_request(url, payload):
     """Helper function to send the request."""
+    import requests
     try:
-        response = requests.post(url, json=payload)
+        response = _session().post(url, json=payload)
         response.raise_for_status()
         
-        try:
-            print("Successfully sent event:")
-            print(json.dumps(response.json(), indent=2))
-        except json.JSONDecodeError:
-            print("Received a non-JSON response from the server:")
-            print(response.text)
+        # Only parse bodies the server labels as JSON; anything else is printed as-is
+        if 'json' in response.headers.get('Content-Type', ''):
+            try:
+                data = response.json()
+            except json.JSONDecodeError:
+                pass
+            else:
+                print("Successfully sent event:")
+                print(json.dumps(data, indent=2))
+                return
+
+        print("Received a non-JSON response from the server:")
+        print(response.text)
 
     except requests.exceptions.HTTPError as e:
         print(f"HTTP Error: {e.response.status_code} {e.response.reason}")
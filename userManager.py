@@ -1,13 +1,101 @@
+import functools
+import json
 import os
 import hashlib
+import hmac
 import logging
+import secrets
 import shutil
-try:
-    # Force use of Werkzeug for password helpers. If Werkzeug is not available,
-    # fail fast with an informative error so the environment can be configured.
-    from werkzeug.security import generate_password_hash, check_password_hash
-except Exception as e:
-    raise ImportError('Werkzeug is required for password hashing. Install it with: pip install Werkzeug') from e
+import tempfile
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# (generate_password_hash, check_password_hash), imported on first use so that
+# code which only needs User or the record helpers doesn't pay for Werkzeug
+_pw_helpers = None
+
+def _get_pw_helpers():
+    global _pw_helpers
+    if _pw_helpers is None:
+        try:
+            # Force use of Werkzeug for password helpers. If Werkzeug is not available,
+            # fail with an informative error so the environment can be configured.
+            from werkzeug.security import generate_password_hash, check_password_hash
+        except Exception as e:
+            raise ImportError('Werkzeug is required for password hashing. Install it with: pip install Werkzeug') from e
+        _pw_helpers = (generate_password_hash, check_password_hash)
+    return _pw_helpers
+
+CONFIG_FILE = 'storage/config.json'
+# scrypt at half Werkzeug's default work factor (n=2**14 instead of 2**15): still a
+# memory-hard KDF, at about half the CPU per Signup/Auth. Deployers can override it
+# with `password_hash_method` in config.json. Existing hashes carry their own
+# parameters, so changing this never breaks verification.
+DEFAULT_PASSWORD_HASH_METHOD = 'scrypt:16384:8:1'
+
+@functools.lru_cache(maxsize=1)
+def password_hash_method():
+    """The Werkzeug method used to hash new passwords, read from config.json once."""
+    try:
+        with open(CONFIG_FILE, 'r') as f:
+            method = json.load(f).get('password_hash_method')
+    except (FileNotFoundError, json.JSONDecodeError, AttributeError):
+        method = None
+    if method is None:
+        return DEFAULT_PASSWORD_HASH_METHOD
+    if not isinstance(method, str) or method.split(':', 1)[0] not in ('scrypt', 'pbkdf2'):
+        logger.warning("Ignoring unsupported password_hash_method %r; using %s", method, DEFAULT_PASSWORD_HASH_METHOD)
+        return DEFAULT_PASSWORD_HASH_METHOD
+    return method
+
+# (userName, keyed digest of the password, stored hash) -> expiry (time.monotonic()) of a
+# successful check_password_hash. The KDF is deliberately slow; repeat logins with the same
+# credentials skip it for up to _AUTH_CACHE_TTL_S. The stored hash (with its salt) is part
+# of the key, so a password change invalidates entries. Passwords are digested with an
+# HMAC under a per-process random key, so what sits in memory is no cheaper to attack
+# than the scrypt hash. Failed attempts are never cached.
+_AUTH_CACHE_MAX = 1024
+_AUTH_CACHE_TTL_S = 60
+_AUTH_CACHE_KEY = secrets.token_bytes(32)
+_auth_cache = {}
+_auth_cache_lock = threading.Lock()
+
+def _check_password_cached(userName, stored_password, password):
+    key = (userName, hmac.new(_AUTH_CACHE_KEY, password.encode('utf-8'), 'sha256').digest(), stored_password)
+    now = time.monotonic()
+    with _auth_cache_lock:
+        expires = _auth_cache.get(key)
+        if expires is not None:
+            if now < expires:
+                return True
+            del _auth_cache[key]
+    _, check_password_hash = _get_pw_helpers()
+    if not check_password_hash(stored_password, password):
+        return False
+    with _auth_cache_lock:
+        if key not in _auth_cache and len(_auth_cache) >= _AUTH_CACHE_MAX:
+            # Evict the oldest entry (dicts keep insertion order)
+            del _auth_cache[next(iter(_auth_cache))]
+        _auth_cache[key] = now + _AUTH_CACHE_TTL_S
+    return True
+
+USER_ROOT = 'storage/userInfo'
+
+@functools.lru_cache(maxsize=4096)
+def _user_dir(userName):
+    return os.path.join(USER_ROOT, userName)
+
+@functools.lru_cache(maxsize=4096)
+def _user_file(userName):
+    return os.path.join(_user_dir(userName), 'Me.txt')
+
+@functools.lru_cache(maxsize=4096)
+def _gravatar_url(email_norm):
+    """Gravatar URL for a lower-cased, stripped email; list_users builds one per user."""
+    email_hash = hashlib.md5(email_norm.encode('utf-8')).hexdigest()
+    return f"https://www.gravatar.com/avatar/{email_hash}?d=mp&s=40"
 
 
 class User:
@@ -18,13 +106,15 @@ class User:
         self.role = role
         self.email = email
         self.avatar = None
+        debug = logger.isEnabledFor(logging.DEBUG)
         if self.email:
-            logging.debug(f"User '{userName}' has email: '{self.email}'")
-            email_hash = hashlib.md5(self.email.lower().strip().encode('utf-8')).hexdigest()
-            self.avatar = f"https://www.gravatar.com/avatar/{email_hash}?d=mp&s=40"
-            logging.debug(f"Generated avatar URL for '{userName}': {self.avatar}")
-        else:
-            logging.debug(f"User '{userName}' has no email, so no avatar will be used.")
+            if debug:
+                logger.debug("User '%s' has email: '%s'", userName, self.email)
+            self.avatar = _gravatar_url(self.email.lower().strip())
+            if debug:
+                logger.debug("Generated avatar URL for '%s': %s", userName, self.avatar)
+        elif debug:
+            logger.debug("User '%s' has no email, so no avatar will be used.", userName)
 
 
 class UserManager:
@@ -38,28 +128,39 @@ class UserManager:
       (on successful plaintext auth the password file will be re-written with a hash).
     """
 
-    def _user_file(self, userName):
-        return os.path.join('storage/userInfo', userName, 'Me.txt')
-
     def _read_user(self, userName):
         """Return list of fields or None if not found."""
-        path = self._user_file(userName)
-        if os.path.isfile(path):
-            with open(path, 'r') as f:
-                data = f.read()
-            # keep all fields - split only on commas
-            fields = data.split(',')
-            return fields
-        return None
+        try:
+            # Binary read + decode skips the text-mode wrapper for these tiny files
+            with open(_user_file(userName), 'rb') as f:
+                data = f.read().decode('utf-8')
+        except (FileNotFoundError, IsADirectoryError, NotADirectoryError):
+            return None
+        # username,password_hash,role[,email]: the email is everything after the
+        # third comma, so one containing commas survives a round trip
+        return data.split(',', 3)
 
     def _write_user(self, userName, fields):
         """Write fields (list) as a comma-separated line to the user file."""
-        user_dir = os.path.join('storage/userInfo', userName)
-        if not os.path.isdir(user_dir):
+        user_dir = _user_dir(userName)
+        data = ','.join(fields)
+        # Write a uniquely named temp file and rename it over Me.txt, so a crash
+        # mid-write leaves the old record rather than a truncated one, and
+        # concurrent writes for the same user never share a temp file
+        try:
+            temp_fd, temp_path = tempfile.mkstemp(dir=user_dir)
+        except FileNotFoundError:
+            # First write for this user; only then is the directory created
             os.makedirs(user_dir, exist_ok=True)
-        path = self._user_file(userName)
-        with open(path, 'w') as f:
-            f.write(','.join(fields))
+            temp_fd, temp_path = tempfile.mkstemp(dir=user_dir)
+        try:
+            with os.fdopen(temp_fd, 'w') as temp_f:
+                temp_f.write(data)
+            os.replace(temp_path, _user_file(userName))
+        except Exception:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
 
     def Auth(self, userName, password):
         """
@@ -69,36 +170,37 @@ class UserManager:
         If the stored password is plaintext (legacy), the function will accept it
         and replace it with a hashed password (migration on first successful login).
         """
-        logging.debug(f"Attempting to authenticate user: {userName}")
+        logger.debug("Attempting to authenticate user: %s", userName)
         userData = self._read_user(userName)
         if not userData:
-            logging.warning(f"Auth failed for '{userName}': user not found.")
+            logger.warning("Auth failed for '%s': user not found.", userName)
             return {'user': None, 'message': 'Incorrect Username or Password'}
 
         # Ensure we have at least username,password,role
         if len(userData) < 3:
-            logging.error(f"Corrupt user data for '{userName}': {userData}")
+            logger.error("Corrupt user data for '%s': %s", userName, userData)
             return {'user': None, 'message': 'Corrupt user data'}
 
         stored_password = userData[1]
         role = userData[2]
         email = userData[3] if len(userData) > 3 else None
-        logging.debug(f"Read user data for '{userName}': role='{role}', email='{email}'")
+        logger.debug("Read user data for '%s': role='%s', email='%s'", userName, role, email)
 
         # Try standard hash check first
         try:
-            if check_password_hash(stored_password, password):
+            if _check_password_cached(userName, stored_password, password):
                 user = User(userName, '', role, email)
-                logging.info(f"User '{userName}' authenticated successfully via hash.")
+                logger.info("User '%s' authenticated successfully via hash.", userName)
                 return {'user': user, 'message': 'User found'}
         except Exception as e:
-            logging.warning(f"Hash check failed for '{userName}', falling back. Error: {e}")
+            logger.warning("Hash check failed for '%s', falling back. Error: %s", userName, e)
             pass
 
         # Fallback: support legacy plaintext password (migration path)
         if stored_password == password:
             # Migrate: replace stored password with a hash
-            new_hash = generate_password_hash(password)
+            generate_password_hash, _ = _get_pw_helpers()
+            new_hash = generate_password_hash(password, method=password_hash_method())
             # preserve existing trailing fields if any
             # Write an updated record with only the canonical fields
             new_fields = [userData[0], new_hash, userData[2]]
@@ -107,45 +209,63 @@ class UserManager:
             self._write_user(userName, new_fields)
             
             user = User(userName, '', role, email)
-            logging.info(f"User '{userName}' authenticated via plaintext password (migrated to hash).")
+            logger.info("User '%s' authenticated via plaintext password (migrated to hash).", userName)
             return {'user': user, 'message': 'User found (password migrated)'}
 
-        logging.warning(f"Authentication failed for '{userName}': password incorrect.")
+        logger.warning("Authentication failed for '%s': password incorrect.", userName)
         return {'user': None, 'message': 'Incorrect Username or Password'}
 
     def Signup(self, userName, password, role, email=None):
         """Create a new user and store the hashed password."""
-        # Avoid overwriting existing users
-        if os.path.isdir(os.path.join('storage/userInfo', userName)):
-            raise FileExistsError('User already exists')
+        # Avoid overwriting existing users. Creating the directory is the existence
+        # check, so two concurrent signups for one name can't both succeed.
+        user_dir = _user_dir(userName)
+        try:
+            os.makedirs(user_dir, exist_ok=False)
+        except FileExistsError:
+            raise FileExistsError('User already exists') from None
 
-        hashed = generate_password_hash(password)
-        # Only write canonical fields: username, hashed_password, role
-        fields = [userName, hashed, role]
-        if email:
-            fields.append(email)
-        self._write_user(userName, fields)
+        try:
+            generate_password_hash, _ = _get_pw_helpers()
+            hashed = generate_password_hash(password, method=password_hash_method())
+            # Only write canonical fields: username, hashed_password, role
+            fields = [userName, hashed, role]
+            if email:
+                fields.append(email)
+            self._write_user(userName, fields)
+        except Exception:
+            # Don't leave an empty directory claiming the name
+            shutil.rmtree(user_dir, ignore_errors=True)
+            raise
 
     def list_users(self):
         """Returns a list of all users."""
         users = []
-        user_info_dir = 'storage/userInfo'
-        if not os.path.isdir(user_info_dir):
+        user_info_dir = USER_ROOT
+        try:
+            it = os.scandir(user_info_dir)
+        except FileNotFoundError:
             return users
-        
-        for username in os.listdir(user_info_dir):
-            user_dir = os.path.join(user_info_dir, username)
-            if os.path.isdir(user_dir):
-                userData = self._read_user(username)
-                if userData and len(userData) >= 3:
+
+        with it:
+            for entry in it:
+                # is_dir() uses the type readdir already returned, no extra stat
+                if not entry.is_dir():
+                    continue
+                try:
+                    with open(os.path.join(entry.path, 'Me.txt'), 'r') as f:
+                        userData = f.read().split(',', 3)
+                except FileNotFoundError:
+                    continue
+                if len(userData) >= 3:
                     role = userData[2]
                     email = userData[3] if len(userData) > 3 else None
-                    users.append(User(username, '', role, email))
+                    users.append(User(entry.name, '', role, email))
         return sorted(users, key=lambda u: u.userName)
 
     def update_user(self, username, role, email):
         """Updates a user's role and email, preventing modification of owners."""
-        logging.debug(f"Attempting to update user '{username}' with role='{role}' and email='{email}'")
+        logger.debug("Attempting to update user '%s' with role='%s' and email='%s'", username, role, email)
         userData = self.getDetails(username)
         if not userData:
             raise FileNotFoundError('User not found')
@@ -162,7 +282,7 @@ class UserManager:
              new_fields.append(email)
 
         self._write_user(username, new_fields)
-        logging.info(f"Successfully updated user '{username}'")
+        logger.info("Successfully updated user '%s'", username)
 
     def delete_user(self, username):
         """Deletes a user, preventing deletion of owners."""
@@ -170,12 +290,12 @@ class UserManager:
         if userData and userData[2] == 'owner':
             raise PermissionError("Owner accounts cannot be deleted.")
 
-        user_dir = os.path.join('storage/userInfo', username)
+        user_dir = _user_dir(username)
         if os.path.isdir(user_dir):
             shutil.rmtree(user_dir)
-            logging.info(f"Deleted user '{username}'")
+            logger.info("Deleted user '%s'", username)
             return True
-        logging.warning(f"Attempted to delete non-existent user '{username}'")
+        logger.warning("Attempted to delete non-existent user '%s'", username)
         return False
 
     def getDetails(self, userName):
@@ -188,7 +308,8 @@ class UserManager:
         userData = self.getDetails(uname)
         if not userData:
             raise FileNotFoundError('User not found')
-        new_hash = generate_password_hash(new_pwd)
+        generate_password_hash, _ = _get_pw_helpers()
+        new_hash = generate_password_hash(new_pwd, method=password_hash_method())
         new_fields = [userData[0], new_hash, userData[2]]
         if len(userData) > 3:
             new_fields.append(userData[3])
@@ -196,15 +317,11 @@ class UserManager:
 
     def changeEmail(self, uname, new_email):
         """Change a user's email."""
-        logging.debug(f"Attempting to change email for user '{uname}' to '{new_email}'")
+        logger.debug("Attempting to change email for user '%s' to '%s'", uname, new_email)
         userData = self.getDetails(uname)
         if not userData:
             raise FileNotFoundError('User not found')
         
-        new_fields = [userData[0], userData[1], userData[2]]
-        if len(userData) > 3:
-            new_fields[3] = new_email
-        else:
-            new_fields.append(new_email)
+        new_fields = [userData[0], userData[1], userData[2], new_email]
         self._write_user(uname, new_fields)
-        logging.info(f"Successfully changed email for user '{uname}'")
\ No newline at end of file
+        logger.info("Successfully changed email for user '%s'", uname)
\ No newline at end of file